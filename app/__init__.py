@@ -1,15 +1,81 @@
 # app/__init__.py
-from flask import Flask
+import time
 from config import Config
 
 def create_app(config_class=Config):
+    # Imported here so scripts that only need app.models or app.utils skip loading Flask
+    from flask import Flask
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Ensure required directories exist
+    app.config['PROBLEMS_DIR'].mkdir(exist_ok=True)
+    (app.config['STATIC_DIR'] / 'sounds').mkdir(exist_ok=True, parents=True)
+    
     # Register blueprints
     from app.routes import main_bp, api_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # Request latency by endpoint; served with the other metrics at /metrics
+    from flask import g, request
+    from app.utils.metrics import REQUEST_SECONDS
+    
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def record_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, request.endpoint or 'unmatched',
+                                    request.method, str(response.status_code))
+        return response
+    
+    # One alarm table per app, in the database its config names
+    from app.models.alarm import AlarmManager
+    app.alarm_manager = AlarmManager(app.config['ALARM_DB_PATH'])
+    
+    # Other server processes may have changed the alarms; pick their edits up per request
+    if app.config['SHARED_STATE']:
+        @app.before_request
+        def refresh_alarms():
+            app.alarm_manager.refresh()
+    
+    # One challenge registry shared by every request and the alarm worker
+    from app.utils.challenge_manager import ChallengeManager
+    app.challenge_manager = ChallengeManager(
+        app.config['PROBLEMS_DIR'],
+        result_cache_size=app.config['RESULT_CACHE_SIZE'],
+        result_cache_ttl=app.config['RESULT_CACHE_TTL'],
+        bundle_path=app.config['PROBLEM_BUNDLE']
+    )
+    
+    # Challenge selection learns from each user's history, kept in the alarm store
+    from app.utils.challenge_selector import make_selector
+    app.challenge_manager.set_selector(make_selector(app.config['CHALLENGE_SELECTOR'], app.alarm_manager.store))
+    
+    # Pre-warm the solution sandbox used for grading
+    if app.config['SANDBOX_ENABLED']:
+        app.challenge_manager.start_sandbox(
+            size=app.config['SANDBOX_WORKERS'],
+            timeout=app.config['SANDBOX_TIMEOUT'],
+            cpu_seconds=app.config['SANDBOX_CPU_SECONDS'],
+            memory_limit=app.config['SANDBOX_MEMORY_MB'] * 1024 * 1024
+        )
+    
+    # Submissions are graded as jobs on a bounded queue; in shared mode job states go through the alarm store
+    from app.utils.grading_queue import GradingQueue
+    shared_store = app.alarm_manager.store if app.config['SHARED_STATE'] else None
+    app.grading_queue = GradingQueue(
+        app.challenge_manager,
+        workers=app.config['GRADING_WORKERS'],
+        max_pending=app.config['GRADING_QUEUE_SIZE'],
+        retention=app.config['GRADING_JOB_TTL'],
+        store=shared_store
+    )
+    app.grading_queue.start()
+    
     return app
 
@@ -1,71 +1,316 @@
 # app/models/alarm.py
-from datetime import datetime
+from datetime import date, datetime
+import threading
 import uuid
-from typing import Dict, Optional, Any
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Any
+from app.models.alarm_store import AlarmStore
+from app.models.recurrence import AlarmRule
+
+# Owner of alarms created without an explicit user
+DEFAULT_OWNER = 'default'
 
 class Alarm:
     """Represents a single alarm."""
-    def __init__(self, time: str):
-        self.id = str(uuid.uuid4())
+    # Slots keep per-alarm memory small for tables of 100k+ alarms
+    __slots__ = ('id', 'time', 'active', 'last_triggered', 'created_at', 'rule', 'owner')
+    
+    def __init__(self, time: str, id: Optional[str] = None, active: bool = True,
+                 last_triggered: Optional[str] = None, created_at: Optional[str] = None,
+                 rule: Optional[AlarmRule] = None, owner: str = DEFAULT_OWNER):
+        self.id = id or str(uuid.uuid4())
         self.time = time
-        self.active = True
-        self.last_triggered = None
-        self.created_at = datetime.now().isoformat()
+        self.active = active
+        self.last_triggered = last_triggered
+        self.created_at = created_at or datetime.now().isoformat()
+        self.rule = rule or AlarmRule(time)
+        self.owner = owner
+    
+    @classmethod
+    def from_row(cls, row: Tuple) -> 'Alarm':
+        """Build an alarm from an AlarmStore row."""
+        alarm_id, time, active, last_triggered, created_at, days, dates, timezone, owner = row
+        rule = None
+        if days or dates or timezone:
+            rule = AlarmRule(
+                time,
+                days=[int(day) for day in days.split(',')] if days else None,
+                dates=dates.split(',') if dates else None,
+                timezone=timezone
+            )
+        return cls(time, alarm_id, bool(active), last_triggered, created_at, rule, owner)
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], owner: str = DEFAULT_OWNER) -> 'Alarm':
+        """Build an alarm from its API form (as to_dict() plus an optional id).
+
+        Raises ValueError for a malformed time, recurrence or field type.
+        """
+        time = data.get('time')
+        try:
+            # Zero-padded, so stored times compare correctly as text (see AlarmStore.page)
+            time = datetime.strptime(time, "%H:%M").strftime("%H:%M")
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid alarm time: {time!r} (expected HH:MM)")
+        for field in ('owner', 'last_triggered', 'created_at'):
+            if data.get(field) is not None and not isinstance(data[field], str):
+                raise ValueError(f"Invalid alarm {field}: {data[field]!r} (expected a string)")
+        active = data.get('active', True)
+        if not isinstance(active, bool):
+            raise ValueError(f"Invalid alarm active: {active!r} (expected true or false)")
+        try:
+            rule = AlarmRule(time, days=data.get('days'), dates=data.get('dates'), timezone=data.get('timezone'))
+        except TypeError as e:  # A value of the wrong type nested in days or dates
+            raise ValueError(f"Invalid alarm recurrence: {e}")
+        return cls(
+            time, str(data['id']) if data.get('id') else None, active, data.get('last_triggered'),
+            data.get('created_at'), rule, data.get('owner') or owner
+        )
+    
+    def to_row(self) -> Tuple:
+        """Serialize to an AlarmStore row."""
+        rule = self.rule
+        return (
+            self.id, self.time, int(self.active), self.last_triggered, self.created_at,
+            ','.join(map(str, rule.days)) if rule.days else None,
+            ','.join(map(str, rule.dates)) if rule.dates else None,
+            rule.timezone,
+            self.owner
+        )
     
     def to_dict(self) -> Dict[str, Any]:
         return {
             'time': self.time,
             'active': self.active,
             'last_triggered': self.last_triggered,
-            'created_at': self.created_at
+            'created_at': self.created_at,
+            'owner': self.owner,
+            **self.rule.to_dict()
         }
 
+    def next_fire(self, now: datetime) -> Optional[datetime]:
+        """Return the next local time this alarm is due (now if due already), or None if never again."""
+        return self.rule.next_fire(now, self.last_triggered)
+    
+    def fire_date(self, fire_at: datetime) -> date:
+        """The date, in the alarm's own time zone, of a local fire time."""
+        return self.rule.localize(fire_at).date()
+
 class AlarmManager:
-    """Manages multiple alarms."""
-    _instance = None
+    """Manages multiple alarms, persisted to an AlarmStore.
+
+    Request threads read and write concurrently: writes hold self._lock
+    across the store write and the index update, and reads copy what they
+    iterate under it.
+    """
+    
+    def __init__(self, db_path: str):
+        self.alarms: Dict[str, Alarm] = {}
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._by_owner: Dict[str, Set[str]] = {}
+        self.store = AlarmStore(db_path)
+        self._data_version = None
+        self._generation = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._load()
+    
+    def _load(self):
+        """Replay the persisted alarms into memory."""
+        self._data_version = self.store.data_version()
+        self._generation = self.store.alarms_generation()
+        # Index into a scratch namespace, so a reload never exposes a half-filled table
+        loaded = SimpleNamespace(alarms={}, _by_owner={})
+        for row in self.store.load_all():
+            AlarmManager._index(loaded, Alarm.from_row(row))
+        with self._lock:
+            self.alarms, self._by_owner = loaded.alarms, loaded._by_owner
     
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(AlarmManager, cls).__new__(cls)
-            cls._instance.alarms: Dict[str, Alarm] = {}
-        return cls._instance
+    def _index(self, alarm: Alarm):
+        self.alarms[alarm.id] = alarm
+        self._by_owner.setdefault(alarm.owner, set()).add(alarm.id)
     
-    def add_alarm(self, time: str) -> Optional[str]:
-        """Add a new alarm."""
+    def _unindex(self, alarm: Alarm):
+        del self.alarms[alarm.id]
+        owned = self._by_owner[alarm.owner]
+        owned.discard(alarm.id)
+        if not owned:
+            del self._by_owner[alarm.owner]
+
+    def refresh(self) -> bool:
+        """Apply alarm changes made by other processes; returns True if any were.
+
+        Only needed when several processes share the store (see serve.py).
+        Changed alarms are re-read one by one from the store's change log
+        and listeners get 'added' or 'deleted' for each; a process too far
+        behind for the log reloads everything and gets a 'reloaded' event
+        with no alarm id.
+        """
+        with self._refresh_lock:
+            data_version = self.store.data_version()
+            if data_version == self._data_version:
+                return False
+            self._data_version = data_version
+            # The database also changes for active-alarm and command writes; skip those
+            changes = self.store.changes_since(self._generation)
+            if changes is None:
+                self._load()
+                events = [('reloaded', None)]
+            else:
+                events = self._apply_changes(*changes)
+                if not events:
+                    return False
+        for event, alarm_id in events:
+            self._notify(event, alarm_id)
+        return True
+
+    def _apply_changes(self, generation: int, changed: List[str]) -> List[Tuple[str, str]]:
+        """Re-read the changed alarms into the indexes; returns the listener events."""
+        events = []
+        # Held across the read too, so a concurrent write is never overwritten by an older row
+        with self._lock:
+            rows = {row[0]: row for row in self.store.load_ids(changed)}
+            for alarm_id in changed:
+                if alarm_id in self.alarms:
+                    self._unindex(self.alarms[alarm_id])
+                if alarm_id in rows:
+                    self._index(Alarm.from_row(rows[alarm_id]))
+                    events.append(('added', alarm_id))
+                else:
+                    events.append(('deleted', alarm_id))
+            self._generation = generation
+        return events
+
+    def version(self) -> str:
+        """Changes whenever any alarm is added, deleted or updated; usable as an ETag."""
+        return self.store.version()
+
+    def _own_write_done(self):
+        """Count our own write as seen, unless another process has written since the last check."""
+        if self.store.data_version() == self._data_version:
+            self._generation = self.store.alarms_generation()
+
+    def subscribe(self, callback: Callable[[str, str], None]):
+        """Register a callback(event, alarm_id) fired when the schedule changes."""
+        # Events: 'added' (also for updates), 'deleted', and 'reloaded' (alarm_id None) from refresh()
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, alarm_id: str):
+        for callback in self._listeners:
+            callback(event, alarm_id)
+    
+    def add_alarm(self, time: str, days=None, dates=None, timezone: Optional[str] = None,
+                  owner: str = DEFAULT_OWNER) -> Optional[str]:
+        """Add a new alarm for a user, optionally limited to weekdays or dates in a time zone.
+
+        Returns None for a malformed time; raises ValueError for an invalid recurrence.
+        """
         try:
-            # Validate time format
-            datetime.strptime(time, "%H:%M")
-            alarm = Alarm(time)
-            self.alarms[alarm.id] = alarm
-            return alarm.id
-        except ValueError:
+            # Validate time format, stored zero-padded
+            time = datetime.strptime(time, "%H:%M").strftime("%H:%M")
+        except (TypeError, ValueError):
             return None
+        
+        alarm = Alarm(time, rule=AlarmRule(time, days=days, dates=dates, timezone=timezone), owner=owner)
+        with self._lock:
+            self.store.insert(alarm)
+            self._own_write_done()
+            self._index(alarm)
+        self._notify('added', alarm.id)
+        return alarm.id
+    
+    def put_alarms(self, alarms: List[Alarm]) -> List[str]:
+        """Store many alarms in one transaction, replacing any with the same id; returns their ids."""
+        with self._lock:
+            self.store.insert_many(alarms)
+            self._own_write_done()
+            for alarm in alarms:
+                if alarm.id in self.alarms:
+                    self._unindex(self.alarms[alarm.id])
+                self._index(alarm)
+        for alarm in alarms:
+            self._notify('added', alarm.id)
+        return [alarm.id for alarm in alarms]
+    
+    def add_alarms(self, specs: List[Dict[str, Any]], owner: str = DEFAULT_OWNER) -> List[str]:
+        """Add many alarms (each in to_dict() form) at once, or none if any is invalid.
+
+        Raises ValueError naming the first invalid entry.
+        """
+        alarms = []
+        for index, spec in enumerate(specs):
+            try:
+                alarms.append(Alarm.from_dict({**spec, 'id': None}, owner))
+            except ValueError as e:
+                raise ValueError(f"Alarm {index}: {e}")
+        return self.put_alarms(alarms)
     
     def delete_alarm(self, alarm_id: str) -> bool:
         """Delete an alarm."""
-        if alarm_id in self.alarms:
-            del self.alarms[alarm_id]
-            return True
-        return False
+        with self._lock:
+            if alarm_id not in self.alarms:
+                return False
+            self.store.delete(alarm_id)
+            self._own_write_done()
+            self._unindex(self.alarms[alarm_id])
+        self._notify('deleted', alarm_id)
+        return True
     
-    def get_alarms(self) -> Dict[str, Dict[str, Any]]:
-        """Get all alarms."""
-        return {
-            id: alarm.to_dict()
-            for id, alarm in self.alarms.items()
-        }
+    def delete_alarms(self, alarm_ids: List[str]) -> List[str]:
+        """Delete many alarms in one transaction; returns the ids that existed."""
+        with self._lock:
+            found = list(dict.fromkeys(alarm_id for alarm_id in alarm_ids if alarm_id in self.alarms))
+            if found:
+                self.store.delete_many(found)
+                self._own_write_done()
+                for alarm_id in found:
+                    self._unindex(self.alarms[alarm_id])
+        for alarm_id in found:
+            self._notify('deleted', alarm_id)
+        return found
+    
+    def list_alarms(self, cursor: Optional[str] = None, limit: int = 100,
+                    **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of alarms in id order, read from the store.
+
+        Returns the page and the cursor of the next one (None on the last
+        page). Filters are those of AlarmStore.page.
+        """
+        rows = self.store.page(cursor, limit + 1, **filters)
+        page = [{'id': alarm.id, **alarm.to_dict()} for alarm in map(Alarm.from_row, rows[:limit])]
+        return page, (page[-1]['id'] if len(rows) > limit else None)
+    
+    def iter_alarms(self, batch_size: int = 1000, **filters) -> Iterator[Dict[str, Any]]:
+        """Every alarm matching the filters, fetched from the store a batch at a time."""
+        cursor = None
+        while True:
+            page, cursor = self.list_alarms(cursor, batch_size, **filters)
+            yield from page
+            if cursor is None:
+                return
+    
+    def get_alarms(self, owner: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Get all alarms, or only those of one user."""
+        with self._lock:
+            if owner is not None:
+                alarms = [self.alarms[id] for id in self._by_owner.get(owner, ())]
+            else:
+                alarms = list(self.alarms.values())
+        return {alarm.id: alarm.to_dict() for alarm in alarms}
     
     def mark_triggered(self, alarm_id: str, trigger_date) -> bool:
         """Mark an alarm as triggered for today."""
-        if alarm_id in self.alarms:
+        with self._lock:
+            if alarm_id not in self.alarms:
+                return False
+            # Persist first so a crash right after triggering cannot re-fire today
+            self.store.mark_triggered(alarm_id, str(trigger_date))
+            self._own_write_done()
             self.alarms[alarm_id].last_triggered = str(trigger_date)
-            return True
-        return False
+        return True
     
     def get_active_alarms(self) -> Dict[str, Dict[str, Any]]:
         """Get all active alarms."""
-        return {
-            id: alarm.to_dict()
-            for id, alarm in self.alarms.items()
-            if alarm.active
-        }
+        with self._lock:
+            alarms = list(self.alarms.values())
+        return {alarm.id: alarm.to_dict() for alarm in alarms if alarm.active}
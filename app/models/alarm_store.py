@@ -0,0 +1,368 @@
+# app/models/alarm_store.py
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+class AlarmStore:
+    """Durable SQLite (WAL mode) backing store for alarms."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS alarms (
+            id TEXT PRIMARY KEY,
+            time TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            last_triggered TEXT,
+            created_at TEXT NOT NULL
+        )
+    """
+    # Columns added after the original schema, with their SQL types
+    ADDED_COLUMNS = {
+        'days': 'TEXT',
+        'dates': 'TEXT',
+        'timezone': 'TEXT',
+        'owner': "TEXT NOT NULL DEFAULT 'default'"
+    }
+    COLUMNS = 'id, time, active, last_triggered, created_at, days, dates, timezone, owner'
+
+    # Changed-row log entries kept, so other processes can catch up row by row
+    # (AlarmManager.refresh); a process further behind reloads the whole table
+    CHANGE_LOG_SIZE = 10000
+
+    # State shared between server processes (see serve.py): triggered alarms,
+    # commands for the process running the AlarmWorker, grading job states,
+    # and a counter bumped by triggers on every change to the alarms table,
+    # which also log the changed alarm's id under the new generation
+    SHARED_SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS active_alarms (
+            alarm_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            triggered_at REAL NOT NULL,
+            info TEXT NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS active_alarms_owner ON active_alarms (owner, triggered_at)",
+        """CREATE TABLE IF NOT EXISTS worker_commands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            command TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS grading_jobs (
+            id TEXT PRIMARY KEY,
+            updated_at REAL NOT NULL,
+            state TEXT NOT NULL
+        )""",
+        "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('alarms_generation', 0)",
+        # Random per database, so generations of a recreated database never collide
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', abs(random()))",
+        "CREATE TABLE IF NOT EXISTS alarm_changes (generation INTEGER PRIMARY KEY, alarm_id TEXT NOT NULL)",
+    ) + tuple(
+        f"DROP TRIGGER IF EXISTS alarms_generation_{event.lower()}"  # Replaced by alarms_changes_*
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ) + tuple(
+        f"""CREATE TRIGGER IF NOT EXISTS alarms_changes_{event.lower()} AFTER {event} ON alarms BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'alarms_generation';
+            INSERT OR REPLACE INTO alarm_changes (generation, alarm_id)
+                VALUES ((SELECT value FROM meta WHERE key = 'alarms_generation'), {row}.id);
+            DELETE FROM alarm_changes
+                WHERE generation <= (SELECT value FROM meta WHERE key = 'alarms_generation') - {keep};
+        END"""
+        # The constant goes in the iterable, the only part evaluated in class scope
+        for event, row, keep in (
+            ('INSERT', 'NEW', CHANGE_LOG_SIZE), ('UPDATE', 'NEW', CHANGE_LOG_SIZE), ('DELETE', 'OLD', CHANGE_LOG_SIZE)
+        )
+    )
+
+    # Per-user challenge history used to weight challenge selection. Every
+    # change stamps its row with the next stats_generation, so readers can
+    # fetch just the rows changed since they last looked
+    STATS_SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS challenge_stats (
+            owner TEXT NOT NULL,
+            challenge_id TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            failures INTEGER NOT NULL,
+            solves INTEGER NOT NULL,
+            streak INTEGER NOT NULL,
+            solve_seconds REAL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (owner, challenge_id)
+        )""",
+        "CREATE INDEX IF NOT EXISTS challenge_stats_seq ON challenge_stats (seq)",
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('stats_generation', 0)",
+    )
+    STATS_COLUMNS = 'owner, challenge_id, attempts, failures, solves, streak, solve_seconds, seq'
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        # Autocommit connection shared between threads; writes are serialized by self.lock
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # Each commit is fsynced so a trigger is never lost (and re-fired) after a crash
+            self.conn.execute("PRAGMA synchronous=FULL")
+            # Server processes may start together, so create and migrate under one write lock
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(self.SCHEMA)
+                self._migrate()
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _migrate(self):
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(alarms)")}
+        for column, sql_type in self.ADDED_COLUMNS.items():
+            if column not in existing:
+                self.conn.execute(f"ALTER TABLE alarms ADD COLUMN {column} {sql_type}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS alarms_owner ON alarms (owner)")
+        # Serves one user's alarms in id order, for paginated listing
+        self.conn.execute("CREATE INDEX IF NOT EXISTS alarms_owner_id ON alarms (owner, id)")
+        for statement in self.SHARED_SCHEMA + self.STATS_SCHEMA:
+            self.conn.execute(statement)
+        self._pad_times()
+
+    def _pad_times(self):
+        """Rewrite times stored unpadded ("7:05") as HH:MM, so page() can compare them as text."""
+        rows = self.conn.execute(
+            "SELECT id, time FROM alarms WHERE time NOT GLOB '[0-9][0-9]:[0-9][0-9]'"
+        ).fetchall()
+        padded = []
+        for alarm_id, value in rows:
+            try:
+                padded.append((datetime.strptime(value, "%H:%M").strftime("%H:%M"), alarm_id))
+            except (TypeError, ValueError):
+                continue
+        if padded:
+            self.conn.executemany("UPDATE alarms SET time = ? WHERE id = ?", padded)
+
+    def load_all(self) -> List[Tuple]:
+        """Return every stored alarm as a row tuple in COLUMNS order."""
+        with self.lock:
+            return self.conn.execute(f"SELECT {self.COLUMNS} FROM alarms").fetchall()
+
+    def insert(self, alarm):
+        with self.lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO alarms ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                alarm.to_row()
+            )
+
+    def insert_many(self, alarms: List):
+        """Insert or replace many alarms in one transaction (one fsync)."""
+        self._execute_many(
+            f"INSERT OR REPLACE INTO alarms ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [alarm.to_row() for alarm in alarms]
+        )
+
+    def delete_many(self, alarm_ids: List[str]):
+        self._execute_many("DELETE FROM alarms WHERE id = ?", [(alarm_id,) for alarm_id in alarm_ids])
+
+    def _execute_many(self, statement: str, rows: List[Tuple]):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(statement, rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def page(self, after: Optional[str], limit: int, owner: Optional[str] = None,
+             active: Optional[bool] = None, time_from: Optional[str] = None,
+             time_to: Optional[str] = None) -> List[Tuple]:
+        """Up to limit rows (COLUMNS order) with ids after `after`, in id order, optionally filtered.
+
+        Keyset pagination: each page is an index range scan, however deep it is.
+        """
+        clauses, params = [], []
+        for clause, value in (('id > ?', after), ('owner = ?', owner), ('time >= ?', time_from),
+                              ('time <= ?', time_to)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        if active is not None:
+            clauses.append('active = ?')
+            params.append(int(active))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT {self.COLUMNS} FROM alarms {where} ORDER BY id LIMIT ?", (*params, limit)
+            ).fetchall()
+
+    def delete(self, alarm_id: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM alarms WHERE id = ?", (alarm_id,))
+
+    def mark_triggered(self, alarm_id: str, trigger_date: str):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE alarms SET last_triggered = ? WHERE id = ?", (trigger_date, alarm_id)
+            )
+
+    def data_version(self) -> int:
+        """A value that changes whenever another connection commits to the database."""
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def alarms_generation(self) -> int:
+        """Counter bumped by every insert, update or delete on the alarms table."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'alarms_generation'"
+            ).fetchone()[0]
+
+    def changes_since(self, generation: int) -> Optional[Tuple[int, List[str]]]:
+        """(current generation, ids of alarms changed after generation), or None if the log no longer reaches back."""
+        with self.lock:
+            self.conn.execute("BEGIN")  # One snapshot for the generation and the log
+            try:
+                current = self.conn.execute(
+                    "SELECT value FROM meta WHERE key = 'alarms_generation'"
+                ).fetchone()[0]
+                if current == generation:
+                    return current, []
+                oldest = self.conn.execute("SELECT MIN(generation) FROM alarm_changes").fetchone()[0]
+                if oldest is None or oldest > generation + 1 or current < generation:
+                    return None
+                rows = self.conn.execute(
+                    "SELECT DISTINCT alarm_id FROM alarm_changes WHERE generation > ?", (generation,)
+                ).fetchall()
+                return current, [alarm_id for alarm_id, in rows]
+            finally:
+                self.conn.execute("COMMIT")
+
+    def load_ids(self, alarm_ids: List[str]) -> List[Tuple]:
+        """Rows (COLUMNS order) of those of the given alarms that exist."""
+        rows = []
+        with self.lock:
+            for start in range(0, len(alarm_ids), 500):  # Stay under SQLite's variable limit
+                chunk = alarm_ids[start:start + 500]
+                rows += self.conn.execute(
+                    f"SELECT {self.COLUMNS} FROM alarms WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+        return rows
+
+    def version(self) -> str:
+        """Identifies the current contents of the alarms table, across processes and restarts."""
+        with self.lock:
+            meta = dict(self.conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('store_id', 'alarms_generation')"
+            ).fetchall())
+        return f"{meta['store_id']:x}-{meta['alarms_generation']}"
+
+    def activate(self, alarm_id: str, owner: str, triggered_at: float, info: Dict):
+        """Record a triggered alarm as active."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO active_alarms (alarm_id, owner, triggered_at, info) VALUES (?, ?, ?, ?)",
+                (alarm_id, owner, triggered_at, json.dumps(info))
+            )
+
+    def deactivate(self, alarm_id: str) -> bool:
+        """Remove an active alarm; returns whether it was active."""
+        with self.lock:
+            return self.conn.execute(
+                "DELETE FROM active_alarms WHERE alarm_id = ?", (alarm_id,)
+            ).rowcount > 0
+
+    def oldest_active(self, owner: str) -> Optional[Tuple[str, Dict]]:
+        """(alarm id, info) of a user's earliest-triggered active alarm, if any."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT alarm_id, info FROM active_alarms WHERE owner = ? "
+                "ORDER BY triggered_at, alarm_id LIMIT 1", (owner,)
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def load_active(self) -> List[Tuple[str, str, float, Dict]]:
+        """Every active alarm as (alarm id, owner, triggered_at, info)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT alarm_id, owner, triggered_at, info FROM active_alarms"
+            ).fetchall()
+        return [(alarm_id, owner, triggered_at, json.loads(info)) for alarm_id, owner, triggered_at, info in rows]
+
+    def push_command(self, command: str):
+        """Queue a command for the process running the AlarmWorker."""
+        with self.lock:
+            self.conn.execute("INSERT INTO worker_commands (command) VALUES (?)", (command,))
+
+    def pop_commands(self) -> List[str]:
+        """Take every queued worker command, oldest first."""
+        with self.lock:
+            rows = self.conn.execute("SELECT id, command FROM worker_commands ORDER BY id").fetchall()
+            if rows:
+                self.conn.execute("DELETE FROM worker_commands WHERE id <= ?", (rows[-1][0],))
+        return [command for _, command in rows]
+
+    def save_job(self, job_id: str, state: Dict):
+        """Record a grading job's latest state for other server processes."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO grading_jobs (id, updated_at, state) VALUES (?, ?, ?)",
+                (job_id, time.time(), json.dumps(state, default=str))
+            )
+
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute("SELECT state FROM grading_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune_jobs(self, before: float):
+        """Drop grading jobs last updated before the given timestamp."""
+        with self.lock:
+            self.conn.execute("DELETE FROM grading_jobs WHERE updated_at < ?", (before,))
+
+    def record_attempt(self, owner: str, challenge_id: str, passed: bool,
+                       solve_seconds: Optional[float] = None):
+        """Count a graded submission; solve_seconds (trigger to solution) is averaged over recent solves."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'stats_generation'")
+                self.conn.execute(
+                    """INSERT INTO challenge_stats (owner, challenge_id, attempts, failures, solves, streak, solve_seconds, seq)
+                    VALUES (?, ?, 1, ?, ?, ?, ?, (SELECT value FROM meta WHERE key = 'stats_generation'))
+                    ON CONFLICT (owner, challenge_id) DO UPDATE SET
+                        attempts = attempts + 1,
+                        failures = failures + excluded.failures,
+                        solves = solves + excluded.solves,
+                        streak = CASE WHEN excluded.failures THEN 0 ELSE streak + 1 END,
+                        solve_seconds = CASE
+                            WHEN excluded.solve_seconds IS NULL THEN solve_seconds
+                            WHEN solve_seconds IS NULL THEN excluded.solve_seconds
+                            ELSE 0.7 * solve_seconds + 0.3 * excluded.solve_seconds
+                        END,
+                        seq = excluded.seq""",
+                    (owner, challenge_id, int(not passed), int(passed and solve_seconds is not None),
+                     int(passed), solve_seconds)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def stats_generation(self) -> int:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'stats_generation'"
+            ).fetchone()[0]
+
+    def load_stats_since(self, seq: int) -> List[Tuple]:
+        """Challenge stats rows (STATS_COLUMNS order) changed after generation seq."""
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT {self.STATS_COLUMNS} FROM challenge_stats WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,98 @@
+# app/models/recurrence.py
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional, Tuple, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+def parse_weekday(value: Union[int, str]) -> int:
+    """Convert 0-6 (Monday first) or a day name such as 'mon'/'Monday' to a weekday number."""
+    if isinstance(value, int) and 0 <= value <= 6:
+        return value
+    if isinstance(value, str) and value[:3].lower() in WEEKDAY_NAMES:
+        return WEEKDAY_NAMES.index(value[:3].lower())
+    raise ValueError(f"Invalid weekday: {value!r}")
+
+class AlarmRule:
+    """An alarm's recurrence compiled once into a cheap next-fire computation.
+
+    An alarm fires at `time` on every day, only on the given weekdays, or only
+    on the given calendar dates, evaluated in `timezone` (local time if None).
+    `time` must already be a valid zero-padded HH:MM; Alarm.from_dict and
+    AlarmManager.add_alarm check it at the API boundary, and the store only
+    holds such times, so replaying it parses nothing twice.
+    """
+    __slots__ = ('time', 'hour', 'minute', 'days', 'dates', 'timezone', 'tz')
+
+    def __init__(self, time: str, days: Optional[Iterable] = None,
+                 dates: Optional[Iterable[str]] = None, timezone: Optional[str] = None):
+        if days is not None and not isinstance(days, (list, tuple)):
+            raise ValueError(f"Invalid alarm days: {days!r} (expected a list of weekdays)")
+        if dates is not None and not isinstance(dates, (list, tuple)):
+            raise ValueError(f"Invalid alarm dates: {dates!r} (expected a list of YYYY-MM-DD)")
+        if timezone is not None and not isinstance(timezone, str):
+            raise ValueError(f"Unknown time zone: {timezone!r}")
+        self.time = time
+        self.hour = int(time[:2])
+        self.minute = int(time[3:])
+        self.days: Optional[Tuple[int, ...]] = (
+            tuple(sorted({parse_weekday(day) for day in days})) if days else None
+        )
+        try:
+            self.dates: Optional[Tuple[date, ...]] = (
+                tuple(sorted({date.fromisoformat(str(d)) for d in dates})) if dates else None
+            )
+        except ValueError:
+            raise ValueError(f"Invalid alarm dates: {dates!r} (expected YYYY-MM-DD)")
+        self.timezone = timezone or None
+        try:
+            self.tz = ZoneInfo(timezone) if timezone else None
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {timezone!r}")
+
+    def localize(self, now: datetime) -> datetime:
+        """Express a naive local time in the rule's time zone (still naive)."""
+        if self.tz is None:
+            return now
+        return now.astimezone(self.tz).replace(tzinfo=None)
+
+    def occurs_on(self, day: date) -> bool:
+        if self.dates is not None:
+            index = bisect_left(self.dates, day)
+            return index < len(self.dates) and self.dates[index] == day
+        return self.days is None or day.weekday() in self.days
+
+    def _next_day(self, day: date) -> Optional[date]:
+        """First day on or after `day` the rule occurs on."""
+        if self.dates is not None:
+            index = bisect_left(self.dates, day)
+            return self.dates[index] if index < len(self.dates) else None
+        if self.days is None:
+            return day
+        for offset in range(7):
+            candidate = day + timedelta(days=offset)
+            if candidate.weekday() in self.days:
+                return candidate
+        return None
+
+    def next_fire(self, now: datetime, last_triggered: Optional[str] = None) -> Optional[datetime]:
+        """Next naive local time the alarm is due (now, if its minute is in progress); None if never."""
+        zoned_now = self.localize(now)
+        day = self._next_day(zoned_now.date())
+        while day is not None:
+            fire_at = datetime(day.year, day.month, day.day, self.hour, self.minute)
+            # An alarm stays due for its whole minute unless it already fired that day
+            if last_triggered != str(day) and zoned_now < fire_at + timedelta(minutes=1):
+                if self.tz is None:
+                    return fire_at
+                return fire_at.replace(tzinfo=self.tz).astimezone().replace(tzinfo=None)
+            day = self._next_day(day + timedelta(days=1))
+        return None
+
+    def to_dict(self):
+        return {
+            'days': [WEEKDAY_NAMES[day] for day in self.days] if self.days else None,
+            'dates': [str(d) for d in self.dates] if self.dates else None,
+            'timezone': self.timezone
+        }
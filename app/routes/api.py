@@ -1,17 +1,62 @@
 # app/routes/api.py
-from flask import Blueprint, jsonify, request, current_app
-from app.models.alarm import AlarmManager
-from app.utils.challenge_manager import ChallengeManager
+from flask import Blueprint, Response, jsonify, request, current_app, url_for
+from app.models.alarm import Alarm, DEFAULT_OWNER
+from app.utils.grading_queue import GradingJob, QueueFull
+from app.utils.http_cache import ResponseCache
 from datetime import datetime
+import io
+import json
 
 api_bp = Blueprint('api', __name__)
-alarm_manager = AlarmManager()
-challenge_manager = ChallengeManager()
+# Serialized GET responses, revalidated through generation-based ETags
+response_cache = ResponseCache()
+
+# Page sizes for GET /alarms?limit=, and how many alarms an import stores per transaction
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+# Invalid import lines reported back in full; the rest are only counted
+MAX_IMPORT_ERRORS = 100
+# Longest import line accepted (one alarm is a few hundred bytes)
+MAX_IMPORT_LINE_BYTES = 64 * 1024
+
+def _request_owner(data=None) -> str:
+    """The user a request acts for: `user` from the JSON body or query string."""
+    return (data or {}).get('user') or request.args.get('user') or DEFAULT_OWNER
+
+def _alarm_filters():
+    """Store filters from the query string (user, active, time_from, time_to); raises ValueError."""
+    filters = {'owner': request.args.get('user')}
+    active = request.args.get('active')
+    if active is not None:
+        if active.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError("active must be true or false")
+        filters['active'] = active.lower() in ('true', '1')
+    for name in ('time_from', 'time_to'):
+        value = request.args.get(name)
+        if value is not None:
+            # Normalized to zero-padded HH:MM, which is how times are stored and compared
+            filters[name] = datetime.strptime(value, "%H:%M").strftime("%H:%M")
+    return filters
 
 @api_bp.route('/alarms', methods=['GET'])
 def get_alarms():
-    """Get all alarms."""
-    return jsonify(alarm_manager.get_alarms())
+    """Get all alarms, or one user's alarms with ?user=.
+
+    With ?limit= or ?cursor= the alarms come a page at a time, in id order:
+    {"alarms": [...], "next_cursor": ...}, where next_cursor (null on the last
+    page) is passed back to get the following page. Paged listings can also be
+    filtered by active=true|false and time_from/time_to=HH:MM.
+    """
+    if 'limit' in request.args or 'cursor' in request.args:
+        return _alarm_page()
+    owner = request.args.get('user')
+    # Read the version before the alarms, so a concurrent write can only make the ETag stale, never the body
+    return response_cache.respond(
+        ('alarms', owner),
+        f"alarms-{current_app.alarm_manager.version()}",
+        lambda: current_app.json.dumps(current_app.alarm_manager.get_alarms(owner)).encode('utf-8')
+    )
 
 @api_bp.route('/alarms', methods=['POST'])
 def add_alarm():
@@ -23,7 +68,13 @@ def add_alarm():
         return jsonify({"error": "Time is required"}), 400
     
     try:
-        alarm_id = alarm_manager.add_alarm(time)
+        alarm_id = current_app.alarm_manager.add_alarm(
+            time,
+            days=data.get('days'),
+            dates=data.get('dates'),
+            timezone=data.get('timezone'),
+            owner=_request_owner(data)
+        )
         if alarm_id:
             return jsonify({
                 "message": "Alarm added successfully",
@@ -33,27 +84,256 @@ def add_alarm():
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
+def _alarm_page():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+    try:
+        filters = _alarm_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    alarms, next_cursor = current_app.alarm_manager.list_alarms(request.args.get('cursor') or None, limit, **filters)
+    return jsonify({"alarms": alarms, "next_cursor": next_cursor})
+
+@api_bp.route('/alarms/batch', methods=['POST'])
+def add_alarms():
+    """Add many alarms in one transaction: {"alarms": [{"time": ..., "days": ...}, ...]}.
+
+    Either every alarm is added or, if any is invalid, none is.
+    """
+    data = request.get_json()
+    specs = data.get('alarms') if isinstance(data, dict) else None
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) for spec in specs):
+        return jsonify({"error": "alarms must be a list of alarm objects"}), 400
+    
+    try:
+        alarm_ids = current_app.alarm_manager.add_alarms(specs, owner=_request_owner(data))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "message": f"{len(alarm_ids)} alarms added successfully",
+        "alarm_ids": alarm_ids
+    })
+
+@api_bp.route('/alarms/batch-delete', methods=['POST'])
+def delete_alarms():
+    """Delete many alarms in one transaction: {"alarm_ids": [...]}."""
+    data = request.get_json()
+    alarm_ids = data.get('alarm_ids') if isinstance(data, dict) else None
+    if not isinstance(alarm_ids, list) or not all(isinstance(alarm_id, str) for alarm_id in alarm_ids):
+        return jsonify({"error": "alarm_ids must be a list of ids"}), 400
+    
+    deleted = current_app.alarm_manager.delete_alarms(alarm_ids)
+    found = set(deleted)
+    return jsonify({
+        "deleted": deleted,
+        "not_found": [alarm_id for alarm_id in dict.fromkeys(alarm_ids) if alarm_id not in found]
+    })
+
+@api_bp.route('/alarms/export', methods=['GET'])
+def export_alarms():
+    """Stream every alarm (or one user's, with ?user=) as NDJSON, one alarm per line.
+
+    Alarms are read from the store a page at a time, so the table is never
+    held in memory whole. The output can be fed back to /api/alarms/import.
+    """
+    owner = request.args.get('user')
+    # The generator runs after the request context is gone
+    alarm_manager = current_app.alarm_manager
+    
+    def generate():
+        for alarm in alarm_manager.iter_alarms(IMPORT_BATCH_SIZE, owner=owner):
+            yield json.dumps(alarm) + "\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': 'attachment; filename="alarms.ndjson"'
+    })
+
+def _read_lines(stream):
+    """(line number, line) pairs from an NDJSON body; line is None where it exceeds MAX_IMPORT_LINE_BYTES."""
+    line_number = 0
+    while True:
+        line = stream.readline(MAX_IMPORT_LINE_BYTES + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > MAX_IMPORT_LINE_BYTES:
+            while line and not line.endswith(b'\n'):  # Skip the rest of it
+                line = stream.readline(MAX_IMPORT_LINE_BYTES)
+            line = None
+        yield line_number, line
+
+@api_bp.route('/alarms/import', methods=['POST'])
+def import_alarms():
+    """Load alarms from an NDJSON body in the export format.
+
+    Lines are read as they arrive and stored IMPORT_BATCH_SIZE at a time.
+    Alarms keep their ids, replacing existing ones with the same id; those
+    without an owner go to ?user=. Invalid lines are skipped and reported.
+    """
+    request.max_content_length = current_app.config['ALARM_IMPORT_MAX_BYTES']
+    owner = _request_owner()
+    imported, failed, errors, batch = 0, 0, [], []
+    
+    def flush():
+        nonlocal imported
+        imported += len(current_app.alarm_manager.put_alarms(batch))
+        batch.clear()
+    
+    # Buffered: the raw request stream reads a line a byte at a time
+    for line_number, line in _read_lines(io.BufferedReader(request.stream, MAX_IMPORT_LINE_BYTES)):
+        if line is not None and not line.strip():
+            continue
+        try:
+            if line is None:
+                raise ValueError(f"line is longer than {MAX_IMPORT_LINE_BYTES} bytes")
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+            batch.append(Alarm.from_dict(data, owner))
+        except ValueError as e:  # json.JSONDecodeError is a ValueError
+            failed += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"line": line_number, "error": str(e)})
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    
+    return jsonify({"imported": imported, "failed": failed, "errors": errors})
+
 @api_bp.route('/alarms/<alarm_id>', methods=['DELETE'])
 def delete_alarm(alarm_id):
     """Delete an alarm."""
-    if alarm_manager.delete_alarm(alarm_id):
+    if current_app.alarm_manager.delete_alarm(alarm_id):
         return jsonify({"message": "Alarm deleted successfully"})
     return jsonify({"error": "Alarm not found"}), 404
 
-@api_bp.route('/check-alarms', methods=['GET'])
-def check_alarms():
-    """Check for triggered alarms."""
-    alarm = current_app.alarm_worker.get_active_alarm()
+# Idle SSE connections send a comment this often so proxies keep them open
+EVENT_KEEPALIVE_SECONDS = 15
+# Longest a request may block on a grading job, and the retry hint sent with a 429
+MAX_JOB_WAIT_SECONDS = 30
+GRADING_RETRY_AFTER_SECONDS = 2
+
+def _alarm_status(alarm):
+    """Build the check-alarms payload for an active alarm (or None)."""
     if alarm:
-        return jsonify({
+        return {
             "alarm_triggered": True,
             "challenge_id": alarm['challenge_id']
-        })
-    return jsonify({"alarm_triggered": False})
+        }
+    return {"alarm_triggered": False}
+
+@api_bp.route('/check-alarms', methods=['GET'])
+def check_alarms():
+    """Check for triggered alarms."""
+    return jsonify(_alarm_status(current_app.alarm_worker.get_active_alarm(_request_owner())))
+
+@api_bp.route('/alarm-events', methods=['GET'])
+def alarm_events():
+    """Stream alarm trigger/clear events as Server-Sent Events."""
+    notifier = current_app.alarm_worker.notifier
+    owner = _request_owner()
+    
+    def stream():
+        version = None  # Forces the current state to be sent first
+        last_status = None
+        while True:
+            new_version, alarm = notifier.wait(owner, version, EVENT_KEEPALIVE_SECONDS)
+            timed_out = new_version == version
+            version = new_version
+            status = _alarm_status(alarm)
+            if timed_out:
+                yield ": keep-alive\n\n"
+            elif status != last_status:  # Skip wake-ups caused by other users' alarms
+                last_status = status
+                yield f"data: {json.dumps(status)}\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def _grading_finished(alarm_worker, challenge_manager, owner: str, challenge_id: str, results):
+    """Clear the user's active alarm if this solved it, recording the attempt for challenge selection.
+
+    Only submissions for the active alarm's challenge count, so practice
+    runs and resubmissions once the alarm is cleared never count as passes.
+    """
+    active_alarm = alarm_worker.get_active_alarm(owner)
+    if not active_alarm or active_alarm['challenge_id'] != challenge_id:
+        return
+    passed = bool(results.get('all_passed'))
+    solve_seconds = None
+    if passed:
+        alarm_worker.clear_alarm(active_alarm['alarm_id'])
+        if active_alarm.get('triggered_at'):
+            solve_seconds = (datetime.now() - datetime.fromisoformat(active_alarm['triggered_at'])).total_seconds()
+    challenge_manager.record_attempt(owner, challenge_id, passed, solve_seconds)
+
+def _accepted_job(job):
+    """202 pointing at the job's poll URL."""
+    return jsonify(job.to_dict()), 202, {'Location': url_for('api.grading_job', job_id=job.id)}
 
 @api_bp.route('/verify-solution', methods=['POST'])
 def verify_solution():
-    """Verify a challenge solution."""
+    """Verify a challenge solution.
+
+    Submissions are graded as jobs on the grading queue; a full queue answers
+    429. With "async": true the job is returned at once (202) for polling at
+    /api/grading-jobs/<job_id>. With "stream": true the results are sent as
+    NDJSON, one event per test as it finishes. "fail_fast": true stops at the
+    first failing test. Otherwise the results are returned once graded or,
+    past MAX_JOB_WAIT_SECONDS, the job is returned as with "async".
+    """
+    data = request.get_json()
+    challenge_id = data.get('challenge_id')
+    solution = data.get('solution')
+    fail_fast = bool(data.get('fail_fast'))
+    
+    if not all([challenge_id, solution]):
+        return jsonify({"error": "Missing required fields"}), 400
+    
+    alarm_worker = current_app.alarm_worker
+    challenge_manager = current_app.challenge_manager
+    owner = _request_owner(data)
+    
+    try:
+        # The job clears the alarm if all tests pass
+        job = current_app.grading_queue.submit(
+            challenge_id, solution, fail_fast,
+            on_graded=lambda results: _grading_finished(alarm_worker, challenge_manager, owner, challenge_id, results)
+        )
+    except QueueFull:
+        return (jsonify({"error": "Too many submissions are waiting to be graded, try again shortly"}), 429,
+                {'Retry-After': str(GRADING_RETRY_AFTER_SECONDS)})
+    
+    if data.get('async'):
+        return _accepted_job(job)
+    
+    if data.get('stream'):
+        def generate():
+            for event in job.iter_events():
+                yield json.dumps(event, default=str) + "\n"
+        
+        return Response(generate(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Grading-Job': job.id})
+    
+    if not job.finished.wait(MAX_JOB_WAIT_SECONDS):
+        return _accepted_job(job)
+    return jsonify(job.results)
+
+@api_bp.route('/analyze-complexity', methods=['POST'])
+def analyze_complexity():
+    """Estimate a solution's time complexity against the problem's reference solution.
+
+    Times both over growing generated inputs (see the challenge's tests.yaml
+    `complexity` section) and returns the fitted classes, their ratio and
+    whether the submission meets the challenge's target. Does not grade.
+    Runs as an 'analyze' job on the grading queue, answered as a synchronous
+    verify-solution request is (429 when full, 202 past MAX_JOB_WAIT_SECONDS).
+    """
     data = request.get_json()
     challenge_id = data.get('challenge_id')
     solution = data.get('solution')
@@ -61,23 +341,50 @@ def verify_solution():
     if not all([challenge_id, solution]):
         return jsonify({"error": "Missing required fields"}), 400
     
-    results = challenge_manager.test_solution(challenge_id, solution)
+    challenge = current_app.challenge_manager.get_current_challenge(challenge_id)
+    if challenge is None:
+        return jsonify({"error": "Challenge not found"}), 404
+    if challenge.complexity is None:
+        return jsonify({"error": f"Challenge {challenge_id} does not support complexity analysis"}), 400
     
-    if results.get('all_passed'):
-        # Clear the alarm if all tests passed
-        active_alarm = current_app.alarm_worker.get_active_alarm()
-        if active_alarm and active_alarm['challenge_id'] == challenge_id:
-            current_app.alarm_worker.clear_alarm(active_alarm['alarm_id'])
+    try:
+        job = current_app.grading_queue.submit(challenge_id, solution, mode=GradingJob.ANALYZE)
+    except QueueFull:
+        return (jsonify({"error": "Too many submissions are waiting to be graded, try again shortly"}), 429,
+                {'Retry-After': str(GRADING_RETRY_AFTER_SECONDS)})
     
-    return jsonify(results)
+    if not job.finished.wait(MAX_JOB_WAIT_SECONDS):
+        return _accepted_job(job)
+    if 'error' in job.results:
+        return jsonify(job.results), 400
+    return jsonify(job.results)
+
+@api_bp.route('/grading-jobs/<job_id>', methods=['GET'])
+def grading_job(job_id):
+    """Get a grading job's status and, once finished, its results.
+
+    With ?wait=<seconds> the request blocks until the job finishes or the
+    wait (capped at MAX_JOB_WAIT_SECONDS) runs out.
+    """
+    wait = min(request.args.get('wait', 0, type=float), MAX_JOB_WAIT_SECONDS)
+    grading_queue = current_app.grading_queue
+    state = grading_queue.wait(job_id, wait) if wait > 0 else grading_queue.get(job_id)
+    if state is None:
+        return jsonify({"error": "Grading job not found"}), 404
+    return jsonify(state)
 
 @api_bp.route('/challenges', methods=['GET'])
 def list_challenges():
     """Get list of available challenges."""
-    return jsonify({
-        "challenges": challenge_manager.list_challenges(),
-        "count": challenge_manager.get_challenge_count()
-    })
+    challenge_manager = current_app.challenge_manager
+    return response_cache.respond(
+        'challenges',
+        f"challenges-{challenge_manager.manifest_version}",
+        lambda: current_app.json.dumps({
+            "challenges": challenge_manager.list_challenges(),
+            "count": challenge_manager.get_challenge_count()
+        }).encode('utf-8')
+    )
 
 @api_bp.route('/dismiss-sound', methods=['POST'])
 def dismiss_sound():
@@ -1,22 +1,46 @@
 # app/routes/main.py
-from flask import Blueprint, render_template, jsonify, current_app
-from app.utils.challenge_manager import ChallengeManager
-from app.models.alarm import AlarmManager
+from flask import Blueprint, render_template, jsonify, current_app, request
+from app.models.alarm import DEFAULT_OWNER
+from app.utils.http_cache import ResponseCache
+from app.utils.metrics import CONTENT_TYPE, REGISTRY
+import hashlib
+from pathlib import Path
 
 main_bp = Blueprint('main', __name__)
-manager = AlarmManager()
+# Challenge pages depend only on the challenge and the templates, so each is rendered once
+page_cache = ResponseCache()
+_template_version = None
+
+def _templates_version() -> str:
+    """Fingerprint of the template files, taken once per process."""
+    global _template_version
+    if _template_version is None:
+        templates = Path(__file__).parent.parent / 'templates'
+        stats = sorted((path.name, path.stat().st_mtime_ns, path.stat().st_size) for path in templates.glob('*.html'))
+        _template_version = repr(stats)
+    return _template_version
 
 @main_bp.route('/')
 def index():
     """Render the main page with alarm settings."""
-    return render_template('index.html', alarms=manager.get_alarms())
+    return render_template('index.html', alarms=current_app.alarm_manager.get_alarms(request.args.get('user', DEFAULT_OWNER)))
+
+@main_bp.route('/metrics')
+def metrics():
+    """Latency histograms in the Prometheus text format."""
+    return current_app.response_class(REGISTRY.render(), content_type=CONTENT_TYPE)
 
 @main_bp.route('/challenge/<challenge_id>')
 def challenge(challenge_id):
-    """Render the challenge page."""
-    challenge_manager = ChallengeManager()
-    challenge = challenge_manager.get_challenge(challenge_id)
+    """Render the challenge page, reloading the challenge first if its source files changed."""
+    challenge = current_app.challenge_manager.get_current_challenge(challenge_id)
     if challenge:
-        return render_template('challenge.html', challenge=challenge)
+        version = repr((challenge_id, challenge.version, _templates_version()))
+        etag = f"challenge-{hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]}"
+        return page_cache.respond(
+            challenge_id, etag,
+            lambda: render_template('challenge.html', challenge=challenge).encode('utf-8'),
+            mimetype='text/html'
+        )
     return "Challenge not found", 404
 
@@ -93,20 +93,34 @@ async function deleteAlarm(alarmId) {
 }
 
 // Check for active alarms
+function handleAlarmStatus(data) {
+    if (data.alarm_triggered) {
+        playAlarm();
+        window.location.href = `/challenge/${data.challenge_id}`;
+    }
+}
+
 async function checkAlarms() {
     try {
         const response = await fetch('/api/check-alarms');
-        const data = await response.json();
-        
-        if (data.alarm_triggered) {
-            playAlarm();
-            window.location.href = `/challenge/${data.challenge_id}`;
-        }
+        handleAlarmStatus(await response.json());
     } catch (error) {
         console.error('Error checking alarms:', error);
     }
 }
 
+// Prefer a single pushed event stream; fall back to polling without EventSource
+function watchAlarms() {
+    if (!window.EventSource) {
+        setInterval(checkAlarms, 1000);
+        return;
+    }
+    
+    const events = new EventSource('/api/alarm-events');
+    events.onmessage = (event) => handleAlarmStatus(JSON.parse(event.data));
+    events.onerror = (error) => console.error('Alarm event stream error:', error);
+}
+
 // Challenge page functions
 let lastActivityTime = Date.now();
 const INACTIVITY_TIMEOUT = 30000; // 30 seconds
@@ -126,16 +140,148 @@ document.addEventListener('mousemove', updateActivity);
 document.addEventListener('keypress', updateActivity);
 document.addEventListener('click', updateActivity);
 
+// POST a solution with streaming enabled; onResult(test, index) runs as each test finishes.
+// Resolves to the final {all_passed, test_results} or {error} summary.
+async function verifySolutionStreaming(challengeId, code, onResult) {
+    const response = await fetch('/api/verify-solution', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            challenge_id: challengeId,
+            solution: code,
+            stream: true,
+        }),
+    });
+    
+    if (!response.ok) {
+        const data = await response.json();
+        return { error: data.error };
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const testResults = [];
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.type === 'result') {
+                testResults.push(event.result);
+                onResult(event.result, event.index);
+            } else if (event.type === 'done') {
+                return { all_passed: event.all_passed, test_results: testResults };
+            } else {
+                return { error: event.error, test_results: testResults };
+            }
+        }
+    }
+    return { error: 'Connection closed before all tests finished', test_results: testResults };
+}
+
+// Read a grading endpoint's response; a 202 means the job outlasted the request,
+// so poll its Location until it finishes. Resolves to { ok, data } with data the results.
+async function gradingResponse(response) {
+    if (response.status !== 202) {
+        return { ok: response.ok, data: await response.json() };
+    }
+    const location = response.headers.get('Location');
+    while (true) {
+        const poll = await fetch(`${location}?wait=25`);
+        const job = await poll.json();
+        if (!poll.ok) {
+            return { ok: false, data: job };
+        }
+        if (job.status === 'done' || job.status === 'failed') {
+            return { ok: job.status === 'done', data: job.results };
+        }
+    }
+}
+
+// Show streamed results in the results panel and handle the final outcome
+async function runSolution(challengeId, code) {
+    const resultsDiv = document.getElementById('test-results');
+    resultsDiv.innerHTML = 'Running tests...';
+    
+    try {
+        let started = false;
+        const data = await verifySolutionStreaming(challengeId, code, (test, index) => {
+            if (!started) {
+                resultsDiv.innerHTML = '';
+                started = true;
+            }
+            resultsDiv.insertAdjacentHTML('beforeend', formatTestResult(test, index));
+        });
+        
+        if (data.error) {
+            resultsDiv.insertAdjacentHTML('beforeend', `<div class="test-result-error">Error: ${data.error}</div>`);
+        } else if (data.all_passed) {
+            stopAlarm();
+            alert('Congratulations! All tests passed. Returning to main page...');
+            setTimeout(() => {
+                window.location.href = '/';
+            }, 2000);
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        resultsDiv.innerHTML = '<div class="test-result-error">Error submitting solution</div>';
+    }
+}
+
 async function submitSolution() {
     const editor = document.getElementById('code-editor');
-    const resultsDiv = document.getElementById('test-results');
-    const code = editor.value;
     const challengeId = window.location.pathname.split('/').pop();
-    
-    resultsDiv.innerHTML = 'Running tests...';
+    await runSolution(challengeId, editor.value);
+}
+
+// Runtime, time limit and reference comparison for one test result
+function formatTestTiming(test) {
+    let html = '';
+    if (test.error) {
+        html += `<div>${test.verdict === 'error' ? 'Error' : 'Details'}: ${test.error}</div>`;
+    }
+    if (test.wall_time !== null && test.wall_time !== undefined) {
+        let timing = `Time: ${(test.wall_time * 1000).toFixed(1)} ms`;
+        if (test.reference_time) {
+            timing += ` (reference ${(test.reference_time * 1000).toFixed(1)} ms, ${test.slowdown}x)`;
+        }
+        if (test.time_limit) {
+            timing += `, limit ${test.time_limit}s`;
+        }
+        html += `<div>${timing}</div>`;
+    }
+    return html;
+}
+
+function formatTestResult(test, index) {
+    const resultClass = test.passed ? 'test-result-success' : 'test-result-failure';
+    return `
+        <div class="${resultClass}">
+            <div><strong>Test ${index + 1}:</strong> ${test.description}</div>
+            <div>Input: ${JSON.stringify(test.input)}</div>
+            <div>Expected: ${JSON.stringify(test.expected)}</div>
+            <div>Got: ${JSON.stringify(test.actual)}</div>
+            ${formatTestTiming(test)}
+        </div>
+    `;
+}
+
+// Ask for an empirical complexity estimate and show it above the test results
+async function analyzeComplexity(challengeId, code) {
+    const resultsDiv = document.getElementById('test-results');
+    resultsDiv.innerHTML = 'Measuring your solution on growing inputs...';
     
     try {
-        const response = await fetch('/api/verify-solution', {
+        const response = await fetch('/api/analyze-complexity', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -145,44 +291,46 @@ async function submitSolution() {
                 solution: code,
             }),
         });
-        
-        const data = await response.json();
-        
-        if (response.ok) {
-            formatAndDisplayResults(data);
-            if (data.all_passed) {
-                stopAlarm();
-                alert('Congratulations! All tests passed. Returning to main page...');
-                setTimeout(() => {
-                    window.location.href = '/';
-                }, 2000);
-            }
-        } else {
-            resultsDiv.innerHTML = `<div class="test-result-error">Error: ${data.error}</div>`;
-        }
+        const { ok, data } = await gradingResponse(response);
+        resultsDiv.innerHTML = ok && !data.error
+            ? formatComplexity(data)
+            : `<div class="test-result-error">Error: ${data.error}</div>`;
     } catch (error) {
         console.error('Error:', error);
-        resultsDiv.innerHTML = '<div class="test-result-error">Error submitting solution</div>';
+        resultsDiv.innerHTML = '<div class="test-result-error">Error analyzing solution</div>';
     }
 }
 
+function formatComplexity(analysis) {
+    const submission = analysis.submission;
+    const reference = analysis.reference;
+    const sizes = `n = ${submission.sizes[0]} to ${submission.sizes[submission.sizes.length - 1]}`;
+    let html = `<div><strong>Your solution:</strong> ${submission.complexity || 'not enough data'}`;
+    if (submission.exponent !== null) {
+        html += ` (time grows like n^${submission.exponent}, ${sizes})`;
+    }
+    html += '</div>';
+    if (reference) {
+        html += `<div><strong>Reference solution:</strong> ${reference.complexity || 'not enough data'}</div>`;
+    }
+    if (analysis.slowdown !== null) {
+        html += `<div>${analysis.slowdown}x the reference's time at n = ${analysis.slowdown_size}`;
+        if (analysis.constant_ratio !== null) {
+            html += `; same growth, constant factor ${analysis.constant_ratio}x`;
+        }
+        html += '</div>';
+    }
+    if (analysis.target) {
+        const resultClass = analysis.meets_target ? 'test-result-success' : 'test-result-failure';
+        const verdict = analysis.meets_target === null ? 'undetermined' : analysis.meets_target ? 'met' : 'not met';
+        html += `<div class="${resultClass}">Target ${analysis.target}: ${verdict}</div>`;
+    }
+    return html;
+}
+
 function formatAndDisplayResults(results) {
     const resultsDiv = document.getElementById('test-results');
-    let html = '';
-    
-    results.test_results.forEach((test, index) => {
-        const resultClass = test.passed ? 'test-result-success' : 'test-result-failure';
-        html += `
-            <div class="${resultClass}">
-                <div><strong>Test ${index + 1}:</strong> ${test.description}</div>
-                <div>Input: ${JSON.stringify(test.input)}</div>
-                <div>Expected: ${JSON.stringify(test.expected)}</div>
-                <div>Got: ${JSON.stringify(test.actual)}</div>
-            </div>
-        `;
-    });
-    
-    resultsDiv.innerHTML = html;
+    resultsDiv.innerHTML = results.test_results.map(formatTestResult).join('');
 }
 
 function resetCode() {
@@ -197,7 +345,7 @@ function resetCode() {
 // Initialize audio and start alarm checking if on main page
 if (document.getElementById('alarm-form')) {
     initAudio();
-    setInterval(checkAlarms, 1000);
+    watchAlarms();
 }
 
 async function dismissSound() {
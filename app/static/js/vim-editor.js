@@ -74,9 +74,9 @@ async function submitSolution() {
             }),
         });
         
-        const data = await response.json();
+        const { ok, data } = await gradingResponse(response);
         
-        if (response.ok) {
+        if (ok) {
             formatAndDisplayResults(data);
             if (data.all_passed) {
                 stopAlarm();
@@ -1,4 +1,13 @@
 # app/utils/__init__.py
-from app.utils.challenge_manager import ChallengeManager
-from app.utils.alarm_worker import AlarmWorker
+# Exports are resolved on first access, so importing a light submodule
+# (e.g. app.utils.challenge_cache) does not load the audio and input stacks.
+_EXPORTS = {
+    'ChallengeManager': 'app.utils.challenge_manager',
+    'AlarmWorker': 'app.utils.alarm_worker'
+}
 
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,117 @@
+# app/utils/active_alarms.py
+
+import heapq
+import itertools
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+class ActiveAlarmsSnapshot:
+    """Immutable view of each user's oldest active alarm.
+
+    Never modified once published; every change builds a new snapshot, so
+    readers need no lock.
+    """
+    __slots__ = ('_oldest', 'count')
+
+    def __init__(self, oldest: Optional[Mapping[str, Dict]] = None, count: int = 0):
+        self._oldest = MappingProxyType(dict(oldest or {}))
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def get(self, owner: str) -> Optional[Dict]:
+        """The owner's oldest active alarm as {'alarm_id', **info}, or None."""
+        state = self._oldest.get(owner)
+        return dict(state) if state is not None else None
+
+    def replace(self, owner: str, state: Optional[Dict], count: int) -> 'ActiveAlarmsSnapshot':
+        """A copy with the owner's entry replaced (or dropped, for None)."""
+        oldest = dict(self._oldest)
+        if state is None:
+            oldest.pop(owner, None)
+        else:
+            oldest[owner] = state
+        return ActiveAlarmsSnapshot(oldest, count)
+
+class ActiveAlarms:
+    """Triggered-but-unsolved alarms, with a per-user priority queue ordered by trigger time.
+
+    Writers must serialize their calls; readers on other threads use
+    `snapshot`, which is replaced atomically after every change.
+    """
+
+    def __init__(self):
+        self.alarms: Dict[str, Dict] = {}
+        # alarm id -> (owner, sequence of its live queue entry)
+        self._entries: Dict[str, Tuple[str, int]] = {}
+        # owner -> heap of (trigger timestamp, sequence, alarm id); removals are lazy
+        self._queues: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._live_by_owner: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self.snapshot = ActiveAlarmsSnapshot()
+
+    def __len__(self) -> int:
+        return len(self.alarms)
+
+    def __contains__(self, alarm_id: str) -> bool:
+        return alarm_id in self.alarms
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.alarms)
+
+    def get(self, alarm_id: str) -> Optional[Dict]:
+        return self.alarms.get(alarm_id)
+
+    def add(self, alarm_id: str, owner: str, triggered_ts: float, info: Dict):
+        """Activate an alarm for its owner; info is what get_oldest() reports."""
+        self.remove(alarm_id)
+        sequence = next(self._sequence)
+        self.alarms[alarm_id] = {**info, 'owner': owner}
+        self._entries[alarm_id] = (owner, sequence)
+        queue = self._queues.setdefault(owner, [])
+        heapq.heappush(queue, (triggered_ts, sequence, alarm_id))
+        self._live_by_owner[owner] = self._live_by_owner.get(owner, 0) + 1
+        self._publish(owner)
+
+    def remove(self, alarm_id: str) -> Optional[Dict]:
+        """Deactivate an alarm, returning its info if it was active."""
+        info = self.alarms.pop(alarm_id, None)
+        if info is None:
+            return None
+
+        owner, _ = self._entries.pop(alarm_id)
+        self._live_by_owner[owner] -= 1
+        queue = self._queues[owner]
+        if not self._live_by_owner[owner]:
+            del self._live_by_owner[owner]
+            del self._queues[owner]
+        elif len(queue) > 2 * self._live_by_owner[owner] + 16:
+            # Too many lazily-removed entries; rebuild so memory stays bounded
+            self._queues[owner] = [entry for entry in queue if self._is_live(entry)]
+            heapq.heapify(self._queues[owner])
+        self._publish(owner)
+        return info
+
+    def _publish(self, owner: str):
+        """Swap in a snapshot reflecting the owner's current oldest alarm."""
+        oldest = self.get_oldest(owner)
+        state = {'alarm_id': oldest[0], **oldest[1]} if oldest else None
+        self.snapshot = self.snapshot.replace(owner, state, len(self.alarms))
+
+    def _is_live(self, entry: Tuple[float, int, str]) -> bool:
+        live = self._entries.get(entry[2])
+        return live is not None and live[1] == entry[1]
+
+    def get_oldest(self, owner: str) -> Optional[Tuple[str, Dict]]:
+        """The owner's earliest-triggered active alarm, in amortized O(log n)."""
+        queue = self._queues.get(owner)
+        while queue and not self._is_live(queue[0]):
+            heapq.heappop(queue)
+        if not queue:
+            return None
+        alarm_id = queue[0][2]
+        return alarm_id, self.alarms[alarm_id]
+
+    def owners(self) -> List[str]:
+        return list(self._queues)
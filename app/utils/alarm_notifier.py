@@ -0,0 +1,33 @@
+# app/utils/alarm_notifier.py
+
+import threading
+from typing import Dict, Optional, Tuple
+
+class AlarmNotifier:
+    """Broadcasts each user's current active alarm to listeners blocked in wait()."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+        self.states: Dict[str, Optional[Dict]] = {}
+
+    def publish(self, owner: str, state: Optional[Dict]):
+        """Replace a user's published state and wake every listener."""
+        with self.condition:
+            self.version += 1
+            if state is None:
+                self.states.pop(owner, None)
+            else:
+                self.states[owner] = state
+            self.condition.notify_all()
+
+    def wait(self, owner: str, since_version: Optional[int],
+             timeout: Optional[float] = None) -> Tuple[int, Optional[Dict]]:
+        """Block until the version moves past since_version or timeout elapses.
+
+        Returns the version and the user's state at wake-up; an unchanged
+        version means the wait timed out.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != since_version, timeout)
+            return self.version, self.states.get(owner)
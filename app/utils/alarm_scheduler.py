@@ -0,0 +1,158 @@
+# app/utils/alarm_scheduler.py
+
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+class AlarmScheduler:
+    """Heap-ordered schedule of alarm fire times, slept on with a monotonic clock."""
+
+    # Upper bound on a single sleep, so wall-clock jumps (suspend, NTP) get noticed
+    RESYNC_INTERVAL = 60.0
+    # How far wall time may drift from the monotonic clock before deadlines are rebuilt
+    CLOCK_JUMP_TOLERANCE = 1.0
+
+    def __init__(self, alarm_manager):
+        self.alarm_manager = alarm_manager
+        self.condition = threading.Condition()
+        # Entries are (monotonic deadline, sequence, alarm id, scheduled wall time)
+        self._heap: List[Tuple[float, int, str, datetime]] = []
+        # Sequence of the live entry per alarm; older heap entries are stale
+        self._live: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._clock_offset = self._wall_offset()
+        self._wake_pending = False  # A wake() not yet consumed by wait_for_due
+        self.lag_stats = {'count': 0, 'last': None, 'max': 0.0, 'total': 0.0}
+
+        alarm_manager.subscribe(self._on_alarm_change)
+        self.rebuild()
+
+    @staticmethod
+    def _wall_offset() -> float:
+        return time.time() - time.monotonic()
+
+    def rebuild(self):
+        """Recompute the deadline of every alarm from the current wall clock."""
+        with self.condition:
+            self._heap.clear()
+            self._live.clear()
+            self._clock_offset = self._wall_offset()
+            for alarm_id in list(self.alarm_manager.alarms):
+                self._schedule(alarm_id)
+            self.condition.notify_all()
+
+    def schedule(self, alarm_id: str):
+        """(Re)schedule the next occurrence of an alarm."""
+        with self.condition:
+            self._schedule(alarm_id)
+            self.condition.notify_all()
+
+    def unschedule(self, alarm_id: str):
+        """Drop an alarm from the schedule."""
+        with self.condition:
+            self._live.pop(alarm_id, None)
+            self.condition.notify_all()
+
+    def wake(self):
+        """Wake any thread blocked in wait_for_due, or make its next call return at once."""
+        with self.condition:
+            self._wake_pending = True
+            self.condition.notify_all()
+
+    def next_deadline(self) -> Optional[float]:
+        """Return the monotonic deadline of the next live entry, if any."""
+        with self.condition:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def wait_for_due(self, max_wait: Optional[float] = None) -> List[Tuple[str, datetime, float]]:
+        """Sleep until an alarm is due, the schedule changes or max_wait elapses.
+
+        Returns (alarm_id, scheduled_at, lag_seconds) for every alarm now due.
+        Due alarms are removed from the schedule; callers reschedule them once handled.
+        """
+        with self.condition:
+            self._resync_if_clock_jumped()
+            self._discard_stale()
+
+            timeout = self.RESYNC_INTERVAL
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - time.monotonic())
+            if max_wait is not None:
+                timeout = min(timeout, max_wait)
+            if timeout > 0 and not self._wake_pending:
+                self.condition.wait(timeout)
+            self._wake_pending = False
+
+            self._resync_if_clock_jumped()
+            return self._pop_due()
+
+    def _schedule(self, alarm_id: str):
+        alarm = self.alarm_manager.alarms.get(alarm_id)
+        if alarm is None or not alarm.active:
+            self._live.pop(alarm_id, None)
+            return
+
+        now = datetime.now()
+        fire_at = alarm.next_fire(now)
+        if fire_at is None:  # Rule has no future occurrences
+            self._live.pop(alarm_id, None)
+            return
+        deadline = time.monotonic() + max(0.0, (fire_at - now).total_seconds())
+        sequence = next(self._sequence)
+        self._live[alarm_id] = sequence
+        heapq.heappush(self._heap, (deadline, sequence, alarm_id, fire_at))
+
+    def _discard_stale(self):
+        while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def _resync_if_clock_jumped(self):
+        if abs(self._wall_offset() - self._clock_offset) > self.CLOCK_JUMP_TOLERANCE:
+            logging.info("Wall clock changed, rebuilding alarm schedule")
+            self._heap.clear()
+            alarm_ids = list(self._live)
+            self._live.clear()
+            self._clock_offset = self._wall_offset()
+            for alarm_id in alarm_ids:
+                self._schedule(alarm_id)
+
+    def _pop_due(self) -> List[Tuple[str, datetime, float]]:
+        due = []
+        now_monotonic = time.monotonic()
+        while self._heap and self._heap[0][0] <= now_monotonic:
+            _, sequence, alarm_id, scheduled_at = heapq.heappop(self._heap)
+            if self._live.get(alarm_id) != sequence:
+                continue
+            del self._live[alarm_id]
+
+            now = datetime.now()
+            if now >= scheduled_at + timedelta(minutes=1):
+                # Slept through the alarm's minute (e.g. host suspended); skip to the next day
+                logging.warning(f"Alarm {alarm_id} missed its {scheduled_at:%H:%M} slot")
+                self._schedule(alarm_id)
+                continue
+
+            lag = max(0.0, (now - scheduled_at).total_seconds())
+            self._record_lag(lag)
+            due.append((alarm_id, scheduled_at, lag))
+        return due
+
+    def _record_lag(self, lag: float):
+        stats = self.lag_stats
+        stats['count'] += 1
+        stats['last'] = lag
+        stats['max'] = max(stats['max'], lag)
+        stats['total'] += lag
+
+    def _on_alarm_change(self, event: str, alarm_id: Optional[str]):
+        if event == 'reloaded':
+            self.rebuild()
+        elif event == 'deleted':
+            self.unschedule(alarm_id)
+        else:
+            self.schedule(alarm_id)
@@ -4,40 +4,64 @@ from datetime import datetime
 import threading
 import time
 import logging
-from typing import Dict, Optional
-import pygame
-from pynput import mouse, keyboard
+from typing import Dict, Optional, Tuple
 from pathlib import Path
 import sys
 import os
+from app.utils.alarm_scheduler import AlarmScheduler
+from app.utils.alarm_notifier import AlarmNotifier
+from app.utils.active_alarms import ActiveAlarms
+from app.utils.sound_cache import SoundCache
+from app.utils.shared_alarms import active_alarm
+from app.utils.metrics import ALARM_TICK_SECONDS, ALARM_TRIGGER_LAG_SECONDS, InstrumentedLock
+from app.models.alarm import DEFAULT_OWNER
+from config import Config
 
 class ActivityMonitor:
+    """Tracks the user's last mouse or keyboard activity while listeners are attached."""
+    # Events closer together than this are folded into one timestamp update
+    COALESCE_INTERVAL = 0.25
+    
     def __init__(self, inactivity_timeout=30):
-        self.last_activity = time.time()
+        self.last_activity = time.monotonic()
+        self._next_update = 0.0
         self.inactivity_timeout = inactivity_timeout
         self.monitoring = False
         self.mouse_listener = None
         self.keyboard_listener = None
     
     def on_activity(self, *args):
-        """Update timestamp of last activity."""
-        self.last_activity = time.time()
+        """Update timestamp of last activity, at most once per COALESCE_INTERVAL."""
+        now = time.monotonic()
+        if now >= self._next_update:
+            self.last_activity = now
+            self._next_update = now + self.COALESCE_INTERVAL
+    
+    def reset(self):
+        """Treat the user as active right now."""
+        self.last_activity = time.monotonic()
+        self._next_update = self.last_activity + self.COALESCE_INTERVAL
     
     def start_monitoring(self):
         """Start monitoring mouse and keyboard activity."""
         if not self.monitoring:
-            self.mouse_listener = mouse.Listener(
-                on_move=self.on_activity,
-                on_click=self.on_activity,
-                on_scroll=self.on_activity
-            )
-            self.keyboard_listener = keyboard.Listener(
-                on_press=self.on_activity,
-                on_release=self.on_activity
-            )
-            
-            self.mouse_listener.start()
-            self.keyboard_listener.start()
+            self.reset()
+            try:
+                from pynput import mouse, keyboard
+                self.mouse_listener = mouse.Listener(
+                    on_move=self.on_activity,
+                    on_click=self.on_activity,
+                    on_scroll=self.on_activity
+                )
+                self.keyboard_listener = keyboard.Listener(
+                    on_press=self.on_activity,
+                    on_release=self.on_activity
+                )
+                
+                self.mouse_listener.start()
+                self.keyboard_listener.start()
+            except Exception as e:  # No input backend, e.g. on a headless host
+                logging.error(f"Failed to start activity monitoring: {e}")
             self.monitoring = True
     
     def stop_monitoring(self):
@@ -47,30 +71,70 @@ class ActivityMonitor:
                 self.mouse_listener.stop()
             if self.keyboard_listener:
                 self.keyboard_listener.stop()
+            self.mouse_listener = self.keyboard_listener = None
             self.monitoring = False
     
     def is_inactive(self):
         """Check if user has been inactive beyond timeout."""
-        return time.time() - self.last_activity > self.inactivity_timeout
+        return time.monotonic() - self.last_activity > self.inactivity_timeout
+
+    def seconds_until_inactive(self) -> float:
+        """Seconds left before the user counts as inactive."""
+        return max(0.0, self.last_activity + self.inactivity_timeout - time.monotonic())
 
 class AlarmSound:
-    def __init__(self):
-        pygame.mixer.init()
+    """Plays alarm sounds; the mixer starts and sounds are decoded only when first played."""
+    def __init__(self, sounds: Optional[Dict[str, Path]] = None, default: Optional[str] = None,
+                 cache_dir: Optional[Path] = None):
+        sounds_dir = Path(__file__).parent.parent / 'static' / 'sounds'
+        self.sounds = sounds or {name: sounds_dir / file for name, file in Config.ALARM_SOUNDS.items()}
+        self.default = default or Config.ALARM_SOUND
+        self.cache = SoundCache(cache_dir or Config.SOUND_CACHE_DIR)
         self.sound = None
+        self.sound_name: Optional[str] = None
+        self._buffer = None  # mmap backing self.sound when loaded from the cache
         self.playing = False
-        self.load_sound()
     
-    def load_sound(self):
-        """Load the alarm sound file."""
-        sound_path = Path(__file__).parent.parent / 'static' / 'sounds' / 'alarm.mp3'
+    def load_sound(self, name: str):
+        """Load a configured sound, from the decoded cache when possible."""
+        self.unload_sound()
+        path = self.sounds.get(name)
+        if path is None:
+            logging.error(f"Unknown alarm sound {name}")
+            return
         try:
-            self.sound = pygame.mixer.Sound(str(sound_path))
+            import pygame
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            mixer_params = pygame.mixer.get_init()
+            
+            buffer = self.cache.get(path, mixer_params)
+            if buffer is not None:
+                self.sound = pygame.mixer.Sound(buffer=buffer)
+                self._buffer = buffer
+            else:
+                self.sound = pygame.mixer.Sound(str(path))
+                self.cache.put(path, mixer_params, self.sound.get_raw())
+            self.sound_name = name
         except Exception as e:
             logging.error(f"Failed to load alarm sound: {e}")
     
-    def play(self):
-        """Play the alarm sound if not already playing."""
-        if not self.playing and self.sound:
+    def unload_sound(self):
+        """Drop the decoded sound from memory."""
+        self.sound = None
+        self.sound_name = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+    
+    def play(self, name: Optional[str] = None):
+        """Play a sound (the default one unless named) if not already playing."""
+        name = name or self.default
+        if self.playing:
+            return
+        if self.sound is None or self.sound_name != name:
+            self.load_sound(name)
+        if self.sound:
             self.sound.play(-1)  # -1 means loop indefinitely
             self.playing = True
     
@@ -79,19 +143,44 @@ class AlarmSound:
         if self.playing and self.sound:
             self.sound.stop()
             self.playing = False
+    
+    def release(self):
+        """Stop playing and shut the mixer down until the next alarm."""
+        self.stop()
+        self.unload_sound()
+        pygame = sys.modules.get('pygame')  # Never imported if no sound was played
+        if pygame is not None and pygame.mixer.get_init():
+            pygame.mixer.quit()
 
 class AlarmWorker:
-    """Background worker to check alarms and trigger challenges."""
+    """Background worker to check alarms and trigger challenges.
+    
+    Active alarms are published as immutable snapshots, so readers never
+    take self.lock. The lock only serializes changes to the active alarms.
+    Audio and input monitoring belong to the worker thread, which brings
+    them in line with the latest snapshot at the end of every tick.
+    """
+    # How often a shared-mode worker looks for changes made by other server processes
+    SYNC_INTERVAL = 1.0
     
-    def __init__(self, alarm_manager, challenge_manager):
+    def __init__(self, alarm_manager, challenge_manager, shared: bool = False):
         self.alarm_manager = alarm_manager
         self.challenge_manager = challenge_manager
-        self.active_alarms: Dict[str, Dict] = {}
+        self.active_alarms = ActiveAlarms()
         self.thread: Optional[threading.Thread] = None
         self.running = False
-        self.lock = threading.Lock()
+        self.lock = InstrumentedLock('alarm_worker')
+        self.scheduler = AlarmScheduler(alarm_manager)
+        self.notifier = AlarmNotifier()
+        # In shared mode (serve.py) active alarms are mirrored to the store for other processes
+        self.shared = shared
+        self._seen_version = None
+        self._dismiss_requested = False
+        if shared:
+            for alarm_id, owner, triggered_at, info in alarm_manager.store.load_active():
+                self.active_alarms.add(alarm_id, owner, triggered_at, info)
         
-        # Initialize activity monitoring and sound
+        # Initialize activity monitoring and sound; input listeners only run while an alarm is active
         self.activity_monitor = ActivityMonitor()
         self.alarm_sound = AlarmSound()
     
@@ -99,82 +188,149 @@ class AlarmWorker:
         """Start the background worker thread."""
         if not self.running:
             self.running = True
+            if self.active_alarms.snapshot:  # Restored from the shared store
+                self.activity_monitor.start_monitoring()
             self.thread = threading.Thread(target=self._check_alarms_loop, daemon=True)
             self.thread.start()
-            self.activity_monitor.start_monitoring()
             logging.info("Alarm worker started")
     
     def stop(self):
         """Stop the background worker thread."""
         self.running = False
+        self.scheduler.wake()
         if self.thread:
             self.thread.join()
         self.activity_monitor.stop_monitoring()
-        self.alarm_sound.stop()
+        self.alarm_sound.release()
         logging.info("Alarm worker stopped")
     
     def _check_alarms_loop(self):
-        """Main loop to check for active alarms."""
+        """Main loop: sleep until the next alarm is due, then trigger it."""
         while self.running:
             try:
-                current_time = datetime.now()
-                current_time_str = current_time.strftime("%H:%M")
-                current_date = current_time.date()
-                
-                with self.lock:
-                    # Check for inactive user when alarm is active
-                    if self.active_alarms and self.activity_monitor.is_inactive():
-                        self.alarm_sound.play()
-                    
-                    alarms = self.alarm_manager.get_alarms()
-                    for alarm_id, alarm_data in alarms.items():
-                        if (current_time_str == alarm_data['time'] and 
-                            (not alarm_data['last_triggered'] or 
-                             alarm_data['last_triggered'] != str(current_date))):
-                            
-                            # Mark alarm as triggered
-                            self.alarm_manager.mark_triggered(alarm_id, current_date)
-                            
-                            # Get random challenge
-                            challenge = self.challenge_manager.get_random_challenge()
-                            
-                            # Store active alarm
-                            self.active_alarms[alarm_id] = {
-                                'time': alarm_data['time'],
-                                'challenge_id': challenge.name,
-                                'triggered_at': datetime.now().isoformat()
-                            }
-                            
-                            # Start playing alarm
-                            self.alarm_sound.play()
-                
-                time.sleep(1)
-                
+                max_wait = self._inactivity_wait()
+                if self.shared:
+                    max_wait = min(max_wait or self.SYNC_INTERVAL, self.SYNC_INTERVAL)
+                self.tick(max_wait)
             except Exception as e:
                 logging.error(f"Error in alarm worker: {e}")
                 time.sleep(5)
     
-    def get_active_alarm(self) -> Optional[Dict]:
-        """Get the currently active alarm if any."""
+    def tick(self, max_wait: Optional[float] = None):
+        """Wait up to max_wait for due alarms, then trigger them and re-check inactivity."""
+        due = self.scheduler.wait_for_due(max_wait)
+        if not self.running and self.thread is not None:
+            return
+        
+        with ALARM_TICK_SECONDS.time():
+            if self.shared:
+                self._sync_shared_state()
+            
+            # Scheduling and challenge picking happen before taking the lock
+            triggers = [self._prepare_trigger(alarm_id, scheduled_at, lag) for alarm_id, scheduled_at, lag in due]
+            triggers = [trigger for trigger in triggers if trigger is not None]
+            if triggers:
+                with self.lock:
+                    for alarm_id, owner, triggered_at, info in triggers:
+                        self._activate(alarm_id, owner, triggered_at, info)
+            
+            self._apply_effects(fired=bool(triggers))
+    
+    def _sync_shared_state(self):
+        """Apply alarm edits, clears and commands made by other processes."""
+        store = self.alarm_manager.store
+        version = store.data_version()
+        if version == self._seen_version:
+            return
+        self._seen_version = version
+        
+        self.alarm_manager.refresh()
+        still_active = {alarm_id for alarm_id, *_ in store.load_active()}
         with self.lock:
-            if self.active_alarms:
-                alarm_id = min(self.active_alarms.keys())
-                return {
-                    'alarm_id': alarm_id,
-                    **self.active_alarms[alarm_id]
-                }
+            for alarm_id in [alarm_id for alarm_id in self.active_alarms if alarm_id not in still_active]:
+                self._clear_alarm(alarm_id)
+        for command in store.pop_commands():
+            if command == 'dismiss_sound':
+                self._dismiss_requested = True
+            else:
+                logging.warning(f"Ignoring unknown worker command {command}")
+    
+    def _inactivity_wait(self) -> Optional[float]:
+        """How long the loop may sleep before re-checking user inactivity."""
+        if not self.active_alarms.snapshot:
             return None
+        return max(1.0, self.activity_monitor.seconds_until_inactive())
+    
+    def _prepare_trigger(self, alarm_id: str, scheduled_at: datetime, lag: float) -> Optional[Tuple]:
+        """Mark a due alarm triggered and pick its challenge; returns what to activate."""
+        alarm = self.alarm_manager.alarms.get(alarm_id)
+        if alarm is None:
+            return None
+        
+        # Mark alarm as triggered and queue its next occurrence
+        self.alarm_manager.mark_triggered(alarm_id, alarm.fire_date(scheduled_at))
+        self.scheduler.schedule(alarm_id)
+        
+        # Get random challenge
+        challenge = self.challenge_manager.get_random_challenge(alarm.owner)
+        
+        triggered_at = datetime.now()
+        info = {
+            'time': alarm.time,
+            'challenge_id': challenge.name,
+            'triggered_at': triggered_at.isoformat(),
+            'lag_seconds': round(lag, 3)
+        }
+        ALARM_TRIGGER_LAG_SECONDS.observe(lag)
+        logging.info(f"Alarm {alarm_id} fired {lag:.3f}s after its scheduled time {scheduled_at:%H:%M}")
+        return alarm_id, alarm.owner, triggered_at.timestamp(), info
+    
+    def _activate(self, alarm_id: str, owner: str, triggered_at: float, info: Dict):
+        """Store an active alarm in its owner's queue and tell connected clients. Caller holds self.lock."""
+        self.active_alarms.add(alarm_id, owner, triggered_at, info)
+        if self.shared:
+            self.alarm_manager.store.activate(alarm_id, owner, triggered_at, info)
+        self.notifier.publish(owner, self.active_alarms.snapshot.get(owner))
+    
+    def _apply_effects(self, fired: bool = False):
+        """Bring audio and input monitoring in line with the current snapshot. Worker thread only."""
+        if self._dismiss_requested:
+            self._dismiss_requested = False
+            self.alarm_sound.stop()
+            self.activity_monitor.reset()  # Reset activity timer
+        
+        if self.active_alarms.snapshot:
+            # Play on a new alarm, or again once the user has gone inactive
+            self.activity_monitor.start_monitoring()
+            if fired or self.activity_monitor.is_inactive():
+                self.alarm_sound.play()
+        else:
+            # No more active alarms
+            self.alarm_sound.release()
+            self.activity_monitor.stop_monitoring()
+    
+    def get_active_alarm(self, owner: str = DEFAULT_OWNER) -> Optional[Dict]:
+        """Get the user's earliest-triggered active alarm if any."""
+        if self.shared:
+            # Other processes may have cleared it since the last sync
+            return active_alarm(self.alarm_manager.store, owner)
+        return self.active_alarms.snapshot.get(owner)
     
     def clear_alarm(self, alarm_id: str):
         """Clear an active alarm after challenge is completed."""
         with self.lock:
-            if alarm_id in self.active_alarms:
-                del self.active_alarms[alarm_id]
-                if not self.active_alarms:  # No more active alarms
-                    self.alarm_sound.stop()
-                    self.activity_monitor.last_activity = time.time()  # Reset activity timer
+            if self.shared:
+                self.alarm_manager.store.deactivate(alarm_id)
+            self._clear_alarm(alarm_id)
+        self.scheduler.wake()  # Let the worker silence the alarm
+    
+    def _clear_alarm(self, alarm_id: str):
+        """Clear an active alarm in this process. Caller holds self.lock."""
+        info = self.active_alarms.remove(alarm_id)
+        if info is not None:
+            self.notifier.publish(info['owner'], self.active_alarms.snapshot.get(info['owner']))
 
     def dismiss_sound(self):
         """Temporarily dismiss the alarm sound."""
-        self.alarm_sound.stop()
-        self.activity_monitor.last_activity = time.time()  # Reset activity timer
+        self._dismiss_requested = True
+        self.scheduler.wake()  # The worker stops the sound and restarts the inactivity countdown
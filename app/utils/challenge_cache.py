@@ -0,0 +1,79 @@
+# app/utils/challenge_cache.py
+
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+class ChallengeCache:
+    """On-disk cache of compiled challenges, invalidated by source file stats."""
+
+    # Bump when the cached payload layout changes
+    FORMAT_VERSION = 3
+    SOURCE_FILES = ('instructions.md', 'starter.py', 'tests.yaml')
+    OPTIONAL_FILES = ('solution.py',)
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def fingerprint(self, problem_dir: Path) -> Tuple:
+        """Cheap change detector for a problem directory: (name, mtime_ns, size) per source file."""
+        stats = []
+        for name in self.SOURCE_FILES:
+            try:
+                st = (problem_dir / name).stat()
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Missing required file {name} in {problem_dir}")
+            stats.append((name, st.st_mtime_ns, st.st_size))
+        for name in self.OPTIONAL_FILES:
+            try:
+                st = (problem_dir / name).stat()
+                stats.append((name, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stats.append((name, None, None))
+        return (self.FORMAT_VERSION, tuple(stats))
+
+    def _entry_path(self, name: str) -> Path:
+        return self.cache_dir / f"{name}.pickle"
+
+    def _read(self, path: Path) -> Optional[Tuple]:
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable challenge cache entry {path.name}: {e}")
+            return None
+
+    def _write(self, path: Path, entry: Tuple):
+        """Write an entry atomically, so readers never see a partial file."""
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write challenge cache entry {path.name}: {e}")
+
+    def get(self, name: str, fingerprint: Tuple) -> Optional[Dict[str, Any]]:
+        """Return the cached payload for a challenge if its fingerprint still matches."""
+        entry = self._read(self._entry_path(name))
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def put(self, name: str, fingerprint: Tuple, payload: Dict[str, Any]):
+        """Store a compiled challenge, replacing any previous entry."""
+        self._write(self._entry_path(name), (fingerprint, payload))
+
+    def get_generated(self, key: str) -> Tuple[bool, Any]:
+        """Look up a reference-computed expected value; returns (found, value)."""
+        entry = self._read(self.cache_dir / 'generated' / f"{key}.pickle")
+        return (False, None) if entry is None else (True, entry[0])
+
+    def put_generated(self, key: str, value: Any):
+        """Store a reference-computed expected value under its generator key."""
+        self._write(self.cache_dir / 'generated' / f"{key}.pickle", (value,))
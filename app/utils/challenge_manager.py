@@ -1,21 +1,96 @@
 # app/utils/challenge_manager.py
 
 import os
-import yaml
+import copy
+import hashlib
+import pickle
+import subprocess
+import sys
+import time
 import logging
 from pathlib import Path
-import random
-import markdown
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
+import threading
 import traceback
+from app.utils.challenge_cache import ChallengeCache
+from app.utils.result_cache import ResultCache
+from app.utils.challenge_selector import ChallengeSelector, UniformSelector
+from app.models.alarm import DEFAULT_OWNER
+from app.utils.metrics import GRADING_SECONDS, TEST_CASE_SECONDS
+from app.utils import complexity, generators
+
+# Where a clean interpreter is started to run solution.py (see prepare_challenge)
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+CLEAN_PROCESS_TIMEOUT = 120.0
+
+def _copy_input(value: Any) -> Any:
+    """Deep-copy test input; a pickle round trip is much faster than deepcopy for large data."""
+    try:
+        return pickle.loads(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return copy.deepcopy(value)
+
+def _first_difference(expected: Any, actual: Any) -> Optional[str]:
+    """Describe where a large actual list first departs from the expected one."""
+    if not isinstance(expected, list) or not isinstance(actual, list):
+        return None
+    for index, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            return f"First difference at index {index}: expected {want!r}, got {got!r}"
+    return f"Expected {len(expected)} items, got {len(actual)}"
+
+def collect_results(events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold a stream of result events into the test_solution response."""
+    results = []
+    for event in events:
+        if event['type'] == 'result':
+            results.append(event['result'])
+        elif event['type'] == 'done':
+            return {
+                'all_passed': event['all_passed'],
+                'test_results': results
+            }
+        else:
+            return {key: value for key, value in event.items() if key != 'type'}
+    return {'error': 'Solution run ended unexpectedly'}
+
+def collect_analysis(events: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """The analyze_complexity response from an analysis run's events."""
+    for event in events:
+        if event['type'] == 'done':
+            return event['analysis']
+        if event['type'] == 'error':
+            return {key: value for key, value in event.items() if key != 'type'}
+    return {'error': 'Analysis ended unexpectedly'}
 
 class ProgrammingChallenge:
     """Represents a single programming challenge."""
-    def __init__(self, name: str, description: str, starter_code: str, test_cases: List[Dict[str, Any]]):
+    def __init__(self, name: str, description: str, starter_code: str, test_cases: List[Dict[str, Any]],
+                 time_limit: Optional[float] = None, reference_code: Optional[str] = None,
+                 version: Optional[Tuple] = None, complexity: Optional[Dict[str, Any]] = None):
         self.name = name
-        self.description = markdown.markdown(description)  # Convert MD to HTML
+        self.description = description  # Rendered HTML
         self.starter_code = starter_code
         self.test_cases = test_cases
+        self.time_limit = time_limit  # Default per-test limit in seconds
+        self.reference_code = reference_code  # The problem's solution.py, if shipped
+        self.version = version  # Source fingerprint this challenge was loaded from
+        self.complexity = complexity  # tests.yaml `complexity` section, if the challenge has one
+        # Per-process state, filled in lazily
+        self.reference_namespace: Optional[Dict[str, Any]] = None
+        self.reference_times: Dict[int, Optional[float]] = {}  # Test index -> seconds
+        self.generated: Dict[int, Dict[str, Any]] = {}  # Test index -> materialized test
+        self.prepared = False  # Whether generated and reference_times are filled in
+        self.reference_profile: Optional[Dict[str, Any]] = None  # solution.py's complexity measurements
+
+    def time_limit_for(self, test: Dict[str, Any]) -> Optional[float]:
+        """The time limit for a test: its own, else the challenge-wide one."""
+        return test.get('time_limit', self.time_limit)
+
+    @property
+    def enforces_target(self) -> bool:
+        """Whether grading holds correct solutions to the complexity target."""
+        return self.complexity is not None and self.complexity.get('enforce', False)
 
     def __repr__(self):
         return f"ProgrammingChallenge(name='{self.name}')"
@@ -30,57 +105,165 @@ class ProgrammingChallenge:
 
 class TestResult:
     """Represents the result of a single test case."""
+    # Verdicts, in addition to the passed flag
+    PASSED = 'passed'
+    WRONG_ANSWER = 'wrong_answer'
+    TOO_SLOW = 'too_slow'
+    ERROR = 'error'
+    
     def __init__(self, passed: bool, description: str, input_data: Any, 
-                 expected: Any, actual: Any, error: Optional[str] = None):
+                 expected: Any, actual: Any, error: Optional[str] = None,
+                 verdict: Optional[str] = None, wall_time: Optional[float] = None,
+                 cpu_time: Optional[float] = None, time_limit: Optional[float] = None,
+                 reference_time: Optional[float] = None):
         self.passed = passed
         self.description = description
         self.input = input_data
         self.expected = expected
         self.actual = actual
         self.error = error
+        self.verdict = verdict or (self.PASSED if passed else self.ERROR if error else self.WRONG_ANSWER)
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.time_limit = time_limit
+        self.reference_time = reference_time
 
     def to_dict(self):
+        slowdown = None
+        if self.wall_time is not None and self.reference_time:
+            slowdown = round(self.wall_time / self.reference_time, 2)
         return {
             'passed': self.passed,
+            'verdict': self.verdict,
             'description': self.description,
             'input': self.input,
             'expected': self.expected,
             'actual': self.actual,
-            'error': self.error
+            'error': self.error,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'time_limit': self.time_limit,
+            'reference_time': self.reference_time,
+            'slowdown': slowdown
         }
 
 class ChallengeManager:
-    """Manages loading and testing programming challenges."""
-    def __init__(self):
-        self.problems_dir = Path(__file__).parent.parent / 'problems'
+    """Lazily-loaded registry of programming challenges; also grades solutions."""
+    def __init__(self, problems_dir: Optional[Path] = None, cache_dir: Optional[Path] = None,
+                 result_cache_size: int = 256, result_cache_ttl: Optional[float] = 3600.0,
+                 selector: Optional[ChallengeSelector] = None, bundle_path: Optional[Path] = None):
+        self.problems_dir = problems_dir or Path(__file__).parent.parent / 'problems'
+        self.cache = ChallengeCache(cache_dir or Path(__file__).parent.parent.parent / '.cache' / 'challenges')
+        # Graded submissions, so resubmitting the same code skips re-execution
+        self.results = ResultCache(result_cache_size, result_cache_ttl)
+        # Loaded challenges; the manifest lists every problem, loaded or not
         self.challenges: Dict[str, ProgrammingChallenge] = {}
-        self.load_all_challenges()
+        self.manifest: List[str] = []
+        self._load_lock = threading.Lock()
+        self._prepare_lock = threading.Lock()
+        # Set once this process has executed a submission; solution.py results
+        # computed after that could have been tampered with
+        self._ran_submissions = False
+        self.sandbox = None
+        self._sandbox_options: Dict[str, Any] = {}
+        # A packed problem bank (see problem_bundle), read instead of problems_dir when given
+        self.bundle_path = bundle_path
+        self.bundle = None
+        # Decides which challenge an alarm asks for; see set_selector
+        self.selector = selector or UniformSelector()
+        self.build_manifest()
+    
+    def set_selector(self, selector: ChallengeSelector):
+        """Swap the challenge selection strategy."""
+        selector.reset(self.manifest)
+        self.selector = selector
+    
+    def start_sandbox(self, **options):
+        """Grade solutions in a pool of sandboxed processes instead of in-process."""
+        from app.utils.sandbox import SandboxPool
+        if self.sandbox is None:
+            self._sandbox_options = options
+            self.sandbox = SandboxPool(self.problems_dir, bundle_path=self.bundle_path, **options)
+    
+    def stop_sandbox(self):
+        """Shut down the sandbox pool, if running."""
+        if self.sandbox is not None:
+            self.sandbox.close()
+            self.sandbox = None
+    
+    def build_manifest(self):
+        """Index the problem names without loading any challenge, dropping those already loaded."""
+        bundle = None
+        if self.bundle_path is not None:
+            # One open and a table-of-contents read, however many problems there are
+            from app.utils.problem_bundle import ProblemBundle
+            bundle = ProblemBundle(self.bundle_path)
+            manifest = list(bundle.names)
+        else:
+            if not self.problems_dir.exists():
+                logging.error(f"Problems directory not found at {self.problems_dir}")
+                raise FileNotFoundError(f"Problems directory not found at {self.problems_dir}")
+            
+            manifest = sorted(
+                problem_dir.name for problem_dir in self.problems_dir.iterdir()
+                if problem_dir.is_dir()
+            )
+        # Swapped under the load lock, so no load reads a closed bundle or caches a challenge from the old one
+        with self._load_lock:
+            old_bundle, self.bundle = self.bundle, bundle
+            self.manifest, self._manifest_set = manifest, set(manifest)
+            self.challenges.clear()
+        if old_bundle is not None:
+            old_bundle.close()
+        self.selector.reset(self.manifest)
+        # Same names give the same version in every process; used as the challenge list ETag
+        self.manifest_version = hashlib.sha1('\n'.join(self.manifest).encode('utf-8')).hexdigest()[:16]
+        logging.info(f"Indexed {len(self.manifest)} programming challenges")
     
     def load_all_challenges(self):
-        """Load all challenges from the problems directory."""
-        if not self.problems_dir.exists():
-            logging.error(f"Problems directory not found at {self.problems_dir}")
-            raise FileNotFoundError(f"Problems directory not found at {self.problems_dir}")
-        
+        """Eagerly load every challenge in the manifest."""
         logging.info("Loading programming challenges...")
-        
-        for problem_dir in self.problems_dir.iterdir():
-            if problem_dir.is_dir():
-                try:
-                    self.load_challenge(problem_dir)
-                    logging.info(f"Loaded challenge: {problem_dir.name}")
-                except Exception as e:
-                    logging.error(f"Error loading challenge {problem_dir.name}: {e}")
+        for name in self.manifest:
+            if self.get_challenge(name):
+                logging.info(f"Loaded challenge: {name}")
     
     def load_challenge(self, problem_dir: Path):
         """Load a single challenge from its directory."""
-        # Check for required files
-        required_files = ['instructions.md', 'starter.py', 'tests.yaml']
-        for file in required_files:
-            if not (problem_dir / file).exists():
-                raise FileNotFoundError(f"Missing required file {file} in {problem_dir}")
+        # Reuse the compiled form unless a source file changed (also checks required files)
+        fingerprint = self.cache.fingerprint(problem_dir)
+        compiled = self.cache.get(problem_dir.name, fingerprint)
+        if compiled is None:
+            compiled = self._compile_challenge(problem_dir)
+            self.cache.put(problem_dir.name, fingerprint, compiled)
+        
+        self._store_challenge(problem_dir.name, compiled, fingerprint)
+    
+    def load_bundled_challenge(self, name: str):
+        """Load a single challenge from the problem bundle."""
+        version, compiled = self.bundle.load(name)
+        self._store_challenge(name, compiled, version)
+    
+    def _store_challenge(self, name: str, compiled: Dict[str, Any], version: Tuple):
+        # Create and store challenge object
+        challenge = ProgrammingChallenge(
+            name=name,
+            description=compiled['description'],
+            starter_code=compiled['starter_code'],
+            test_cases=compiled['test_cases'],
+            time_limit=compiled['time_limit'],
+            reference_code=compiled['reference_code'],
+            version=version,
+            complexity=compiled['complexity']
+        )
+        
+        self.challenges[name] = challenge
+    
+    def _compile_challenge(self, problem_dir: Path) -> Dict[str, Any]:
+        """Parse, validate and render a challenge's source files."""
+        # Only needed on a compile cache miss, so kept out of startup
+        import markdown
+        import yaml
         
-        # Read all challenge files
         with open(problem_dir / 'instructions.md', 'r', encoding='utf-8') as f:
             description = f.read()
         
@@ -89,129 +272,548 @@ class ChallengeManager:
         
         with open(problem_dir / 'tests.yaml', 'r', encoding='utf-8') as f:
             try:
-                test_cases = yaml.safe_load(f)
+                # Use the libyaml-backed loader when PyYAML was built with it
+                test_spec = yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
             except yaml.YAMLError as e:
                 logging.error(f"Error parsing tests.yaml in {problem_dir}: {e}")
                 raise
         
-        # Validate test cases format
-        self._validate_test_cases(test_cases, problem_dir.name)
+        # tests.yaml is either a list of tests or {time_limit: ..., complexity: ..., tests: [...]}
+        time_limit = None
+        complexity_spec = None
+        test_cases = test_spec
+        if isinstance(test_spec, dict):
+            time_limit = test_spec.get('time_limit')
+            complexity_spec = test_spec.get('complexity')
+            test_cases = test_spec.get('tests')
+            self._validate_time_limit(time_limit, f"{problem_dir.name} (challenge)")
+            if complexity_spec is not None:
+                complexity.validate_spec(complexity_spec, problem_dir.name)
+                if 'target' in complexity_spec:
+                    complexity_spec = {**complexity_spec, 'target': complexity.parse_class(complexity_spec['target'])}
         
-        # Create and store challenge object
-        challenge = ProgrammingChallenge(
-            name=problem_dir.name,
-            description=description,
-            starter_code=starter_code,
-            test_cases=test_cases
-        )
+        reference_code = None
+        if (problem_dir / 'solution.py').exists():
+            with open(problem_dir / 'solution.py', 'r', encoding='utf-8') as f:
+                reference_code = f.read()
+        
+        # Validate test cases format
+        self._validate_test_cases(test_cases, problem_dir.name, reference_code is not None)
         
-        self.challenges[problem_dir.name] = challenge
+        return {
+            'description': markdown.markdown(description),  # Convert MD to HTML
+            'starter_code': starter_code,
+            'test_cases': test_cases,
+            'time_limit': time_limit,
+            'reference_code': reference_code,
+            'complexity': complexity_spec
+        }
+    
+    def _validate_time_limit(self, time_limit: Any, where: str):
+        if time_limit is not None and (
+                isinstance(time_limit, bool) or not isinstance(time_limit, (int, float)) or time_limit <= 0):
+            raise ValueError(f"time_limit for {where} must be a positive number of seconds")
     
-    def _validate_test_cases(self, test_cases: List[Dict], challenge_name: str):
+    def _validate_test_cases(self, test_cases: List[Dict], challenge_name: str, has_reference: bool = False):
         """Validate the format of test cases."""
         if not isinstance(test_cases, list):
             raise ValueError(f"Test cases for {challenge_name} must be a list")
         
         required_keys = {'function', 'description', 'input', 'expected'}
+        # Generated tests take their input from generators and their expected value from solution.py
+        generated_keys = {'function', 'description', 'generate'}
         for i, test in enumerate(test_cases, 1):
             if not isinstance(test, dict):
                 raise ValueError(f"Test case {i} in {challenge_name} must be a dictionary")
             
-            missing_keys = required_keys - test.keys()
+            if 'generate' in test:
+                generators.validate_spec(test['generate'], f"test case {i} in {challenge_name}")
+                if 'expected' not in test and not has_reference:
+                    raise ValueError(
+                        f"Generated test case {i} in {challenge_name} needs an expected value or a solution.py"
+                    )
+            
+            missing_keys = (generated_keys if 'generate' in test else required_keys) - test.keys()
             if missing_keys:
                 raise ValueError(
                     f"Test case {i} in {challenge_name} missing required keys: {missing_keys}"
                 )
+            self._validate_time_limit(test.get('time_limit'), f"test case {i} in {challenge_name}")
     
-    def get_random_challenge(self) -> Optional[ProgrammingChallenge]:
-        """Return a random challenge from the available problems."""
-        if not self.challenges:
-            raise ValueError("No challenges available")
-        return random.choice(list(self.challenges.values()))
+    def get_random_challenge(self, owner: str = DEFAULT_OWNER) -> Optional[ProgrammingChallenge]:
+        """Return a challenge for the user, drawn by the selector."""
+        # Skip over problems that fail to load
+        for _ in range(len(self.manifest)):
+            challenge = self.get_challenge(self.selector.choose(owner))
+            if challenge:
+                return challenge
+        raise ValueError("No challenges available")
     
     def get_challenge(self, name: str) -> Optional[ProgrammingChallenge]:
-        """Get a specific challenge by name."""
-        return self.challenges.get(name)
+        """Get a specific challenge by name, loading it on first use."""
+        challenge = self.challenges.get(name)
+        if challenge or name not in self._manifest_set:
+            return challenge
+        
+        with self._load_lock:
+            if name not in self.challenges:
+                try:
+                    if self.bundle is not None:
+                        self.load_bundled_challenge(name)
+                    else:
+                        self.load_challenge(self.problems_dir / name)
+                except Exception as e:
+                    logging.error(f"Error loading challenge {name}: {e}")
+                    return None
+            return self.challenges[name]
     
-    def test_solution(self, challenge_id: str, solution_code: str) -> Dict[str, Any]:
+    def get_current_challenge(self, name: str) -> Optional[ProgrammingChallenge]:
+        """Get a challenge, reloading it first if its source files changed since it was loaded."""
+        challenge = self.get_challenge(name)
+        if challenge is None or self.bundle is not None:  # Bundles only change through reload_challenges
+            return challenge
+        try:
+            fingerprint = self.cache.fingerprint(self.problems_dir / name)
+        except FileNotFoundError:
+            return challenge
+        if fingerprint != challenge.version:
+            logging.info(f"Challenge {name} changed on disk, reloading")
+            with self._load_lock:
+                if self.challenges.get(name) is challenge:
+                    del self.challenges[name]
+            challenge = self.get_challenge(name)
+        return challenge
+    
+    def test_solution(self, challenge_id: str, solution_code: str, fail_fast: bool = False) -> Dict[str, Any]:
         """Test a solution against all test cases for a challenge."""
-        challenge = self.get_challenge(challenge_id)
+        return collect_results(self.stream_solution(challenge_id, solution_code, fail_fast))
+    
+    def stream_solution(self, challenge_id: str, solution_code: str,
+                        fail_fast: bool = False) -> Iterator[Dict[str, Any]]:
+        """Test a solution, yielding each test's result event as soon as it finishes.
+        
+        Completed runs are cached by challenge version and solution syntax tree,
+        so a repeat submission replays its stored events without executing.
+        Runs with a too_slow verdict are not cached, as a rerun may pass.
+        """
+        challenge = self.get_current_challenge(challenge_id)
+        if not challenge:
+            return iter([{'type': 'error', 'error': 'Challenge not found'}])
+        
+        key = self.results.key(challenge_id, challenge.version, solution_code, fail_fast)
+        cached = self.results.get(key) if key is not None else None
+        if cached is not None:
+            return self._timed(challenge_id, 'cache', iter(cached))
+        
+        if self.sandbox is not None:
+            events, source = self.sandbox.stream(challenge_id, solution_code, fail_fast,
+                                                 reference=self._shared_reference(challenge)), 'sandbox'
+        else:
+            events, source = self.iter_solution(challenge_id, solution_code, fail_fast), 'inline'
+        if key is not None:
+            events = self._record_results(key, events)
+        return self._timed(challenge_id, source, events)
+    
+    def _timed(self, challenge_id: str, source: str, events: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pass events through, recording grading time (excluding time spent by the consumer) and per-test times."""
+        elapsed = 0.0
+        while True:
+            start = time.perf_counter()
+            event = next(events, None)
+            elapsed += time.perf_counter() - start
+            if event is None:
+                return
+            if event['type'] == 'result' and source != 'cache':
+                wall_time = event['result'].get('wall_time')
+                if wall_time is not None:
+                    TEST_CASE_SECONDS.observe(wall_time, challenge_id, str(event['index']))
+            elif event['type'] in ('done', 'error'):
+                GRADING_SECONDS.observe(elapsed, challenge_id, source)
+            yield event
+    
+    def _record_results(self, key: Tuple, events: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pass events through, caching the run once it completes."""
+        recorded, timing_dependent = [], False
+        for event in events:
+            recorded.append(event)
+            # A too_slow verdict depends on the machine's load at the time, so a rerun may pass
+            if event['type'] == 'result' and event['result'].get('verdict') == TestResult.TOO_SLOW:
+                timing_dependent = True
+            # Only finished runs are stored; sandbox timeouts and crashes may be transient
+            if event['type'] == 'done' and not timing_dependent:
+                self.results.put(key, tuple(recorded))
+            yield event
+    
+    def run_solution(self, challenge_id: str, solution_code: str, fail_fast: bool = False) -> Dict[str, Any]:
+        """Execute a solution in this process and run it against the test cases."""
+        return collect_results(self.iter_solution(challenge_id, solution_code, fail_fast))
+    
+    def iter_solution(self, challenge_id: str, solution_code: str,
+                      fail_fast: bool = False) -> Iterator[Dict[str, Any]]:
+        """Execute a solution in this process, yielding result events.
+        
+        Yields {'type': 'result', 'index', 'result'} per test, then either
+        {'type': 'done', 'all_passed'} or {'type': 'error', 'error', 'traceback'}.
+        With fail_fast, stops after the first failing test. A challenge that
+        enforces its complexity target gets one more result, after the
+        tests, once they all pass (see _target_result).
+        """
+        challenge = self.get_current_challenge(challenge_id)
         if not challenge:
-            return {'error': 'Challenge not found'}
+            yield {'type': 'error', 'error': 'Challenge not found'}
+            return
         
         namespace = {}
-        results = []
         all_passed = True
         
         try:
+            # Reference data first, while solution.py still runs in an untouched interpreter
+            self.prepare_challenge(challenge)
+            reference_profile = self._reference_profile(challenge) if challenge.enforces_target else None
+            
             # Execute the solution code
+            self._ran_submissions = True
             exec(solution_code, namespace)
             
             # Run each test case
-            for test in challenge.test_cases:
-                try:
-                    # Get the function to test
-                    func = namespace[test['function']]
-                    
-                    # Call function with appropriate parameters
-                    if isinstance(test['input'], dict):
-                        actual = func(**test['input'])
-                    else:
-                        actual = func(test['input'])
-                    
-                    # Compare result
-                    passed = actual == test['expected']
-                    all_passed = all_passed and passed
-                    
-                    # Store result
-                    result = TestResult(
-                        passed=passed,
-                        description=test['description'],
-                        input_data=test['input'],
-                        expected=test['expected'],
-                        actual=actual
-                    )
-                    
-                except Exception as e:
-                    all_passed = False
-                    result = TestResult(
-                        passed=False,
-                        description=test['description'],
-                        input_data=test['input'],
-                        expected=test['expected'],
-                        actual=None,
-                        error=str(e)
-                    )
-                    
-                results.append(result.to_dict())
+            for index, test in enumerate(challenge.test_cases):
+                result = self._run_test(namespace, self._resolve_test(challenge, index),
+                                        challenge.time_limit_for(test),
+                                        challenge.reference_times.get(index))
+                all_passed = all_passed and result.passed
+                yield {'type': 'result', 'index': index, 'result': result.to_dict()}
+                if fail_fast and not result.passed:
+                    break
             
-            return {
-                'all_passed': all_passed,
-                'test_results': results
-            }
+            if challenge.enforces_target and all_passed:
+                result = self._target_result(challenge, namespace, reference_profile)
+                all_passed = result.passed
+                yield {'type': 'result', 'index': len(challenge.test_cases), 'result': result.to_dict()}
+            
+            yield {'type': 'done', 'all_passed': all_passed}
             
         except Exception as e:
-            return {
+            yield {
+                'type': 'error',
+                'error': f"Error executing solution: {str(e)}",
+                'traceback': traceback.format_exc()
+            }
+    
+    @staticmethod
+    def _call_test(namespace: Dict[str, Any], test: Dict[str, Any]):
+        """Call the tested function on a private copy of the input; returns (actual, wall, cpu)."""
+        # Get the function to test
+        func = namespace[test['function']]
+        # Solutions may mutate their arguments, so never hand out the shared test data
+        test_input = _copy_input(test['input'])
+        
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        # Call function with appropriate parameters
+        if isinstance(test_input, dict):
+            actual = func(**test_input)
+        else:
+            actual = func(test_input)
+        return actual, time.perf_counter() - wall_start, time.process_time() - cpu_start
+    
+    def _run_test(self, namespace: Dict[str, Any], test: Dict[str, Any],
+                  time_limit: Optional[float], reference_time: Optional[float]) -> TestResult:
+        """Run one (resolved) test case and grade its correctness and speed."""
+        # Generated tests are reported by their generator spec and shortened values
+        generated = 'generate' in test
+        shown_input = generators.describe_input(test['generate']) if generated else test['input']
+        show = generators.summarize if generated else (lambda value: value)
+        
+        try:
+            actual, wall_time, cpu_time = self._call_test(namespace, test)
+        except Exception as e:
+            return TestResult(
+                passed=False,
+                description=test['description'],
+                input_data=shown_input,
+                expected=show(test['expected']),
+                actual=None,
+                error=str(e),
+                time_limit=time_limit,
+                reference_time=reference_time
+            )
+        
+        # Compare result, then hold correct answers to the time budget
+        passed = actual == test['expected']
+        verdict = TestResult.PASSED if passed else TestResult.WRONG_ANSWER
+        error = None
+        if not passed and generated:
+            error = _first_difference(test['expected'], actual)
+        if passed and time_limit is not None and wall_time > time_limit:
+            passed = False
+            verdict = TestResult.TOO_SLOW
+            error = f"Too slow: took {wall_time:.3f}s, limit is {time_limit:g}s"
+        
+        return TestResult(
+            passed=passed,
+            description=test['description'],
+            input_data=shown_input,
+            expected=show(test['expected']),
+            actual=show(actual),
+            error=error,
+            verdict=verdict,
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            time_limit=time_limit,
+            reference_time=reference_time
+        )
+    
+    def _target_result(self, challenge: ProgrammingChallenge, namespace: Dict[str, Any],
+                       reference: Optional[Dict[str, Any]]) -> TestResult:
+        """Grade a correct solution's measured growth against the challenge's enforced complexity target.
+        
+        Judged like meets_target in an analysis; a solution too slow to be
+        measured at enough sizes misses the target too.
+        """
+        spec = challenge.complexity
+        submission = complexity.profile(self._timer(namespace, spec['function']), spec)
+        analysis = complexity.compare(submission, reference, spec['target'])
+        passed = bool(analysis['meets_target'])
+        error = None
+        if not passed:
+            fitted = submission['complexity'] or 'too slowly to measure'
+            error = f"Too slow: grows like {fitted}, target is {spec['target']}"
+        return TestResult(
+            passed=passed,
+            description=f"Time complexity of {spec['function']}",
+            input_data={'sizes': submission['sizes']},
+            expected=spec['target'],
+            actual=submission['complexity'],
+            error=error,
+            verdict=TestResult.PASSED if passed else TestResult.TOO_SLOW
+        )
+    
+    def _reference_namespace(self, challenge: ProgrammingChallenge) -> Optional[Dict[str, Any]]:
+        """The executed globals of the problem's solution.py, created once per process."""
+        if challenge.reference_code is None:
+            return None
+        if challenge.reference_namespace is None:
+            namespace = {}
+            exec(challenge.reference_code, namespace)
+            challenge.reference_namespace = namespace
+        return challenge.reference_namespace
+    
+    def _resolve_test(self, challenge: ProgrammingChallenge, index: int) -> Dict[str, Any]:
+        """Return a test with concrete input and expected values (generated ones need prepare_challenge)."""
+        return challenge.generated.get(index, challenge.test_cases[index])
+    
+    def prepare_challenge(self, challenge: ProgrammingChallenge):
+        """Materialize generated tests and time solution.py on every test, once per process.
+        
+        solution.py must run in an interpreter no submission has touched: a
+        submission can patch builtins or modules, and expected values are
+        shared with every process through the disk cache. Once this process
+        has executed a submission, the work is done in a fresh one instead.
+        """
+        if challenge.prepared:
+            return
+        with self._prepare_lock:
+            if challenge.prepared:
+                return
+            if self._ran_submissions:
+                generated, reference_times = self._in_clean_process(challenge, 'prepare')
+            else:
+                generated, reference_times = self._reference_data(challenge)
+            challenge.generated = generated
+            challenge.reference_times = reference_times
+            challenge.prepared = True
+    
+    def _shared_reference(self, challenge: ProgrammingChallenge) -> Optional[Tuple]:
+        """(version, generated, reference_times, reference_profile) for sandbox workers,
+        prepared here on first use, or None.
+
+        reference_profile is only measured for challenges enforcing their
+        complexity target, and is None otherwise.
+        """
+        try:
+            self.prepare_challenge(challenge)
+        except Exception as e:
+            logging.error(f"Could not prepare challenge {challenge.name}; the sandbox worker will: {e}")
+            return None
+        reference_profile = self._reference_profile(challenge) if challenge.enforces_target else None
+        return challenge.version, challenge.generated, challenge.reference_times, reference_profile
+    
+    def install_reference(self, name: str, version: Tuple, generated: Dict[int, Dict[str, Any]],
+                          reference_times: Dict[int, Optional[float]],
+                          reference_profile: Optional[Dict[str, Any]] = None):
+        """Adopt reference data prepared by a clean process, if it is for the loaded version of the challenge."""
+        challenge = self.get_current_challenge(name)
+        if challenge is None or challenge.version != version:
+            return
+        with self._prepare_lock:
+            if not challenge.prepared:
+                challenge.generated = generated
+                challenge.reference_times = reference_times
+                challenge.prepared = True
+            if challenge.reference_profile is None:
+                challenge.reference_profile = reference_profile
+    
+    def _reference_data(self, challenge: ProgrammingChallenge) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, Optional[float]]]:
+        """Generated tests and reference times by test index. Only call in a process that ran no submission."""
+        generated, reference_times = {}, {}
+        for index, test in enumerate(challenge.test_cases):
+            if 'generate' in test:
+                test = {**test, 'input': generators.generate_input(test['generate'])}
+                if 'expected' not in test:
+                    test['expected'] = self._reference_expected(challenge, test)
+                generated[index] = test
+            reference_times[index] = self._reference_time(challenge, index, test)
+        return generated, reference_times
+    
+    def _in_clean_process(self, challenge: ProgrammingChallenge, task: str):
+        """Run a reference task ('prepare': _reference_data, 'profile': _measure_reference_profile)
+        for a challenge in a new interpreter; returns its result."""
+        request = (str(self.problems_dir), self.bundle_path and str(self.bundle_path),
+                   str(self.cache.cache_dir), challenge.name, task)
+        completed = subprocess.run(
+            [sys.executable, '-c', 'from app.utils.challenge_manager import _prepare_main; _prepare_main()'],
+            input=pickle.dumps(request), capture_output=True, cwd=PROJECT_ROOT, timeout=CLEAN_PROCESS_TIMEOUT
+        )
+        if completed.returncode != 0:
+            details = completed.stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise RuntimeError(f"Preparing challenge {challenge.name} failed: {details[-1] if details else completed.returncode}")
+        version, result = pickle.loads(completed.stdout)
+        if version != challenge.version:
+            raise RuntimeError(f"Challenge {challenge.name} changed while it was being prepared, please try again")
+        return result
+    
+    def _reference_expected(self, challenge: ProgrammingChallenge, test: Dict[str, Any]) -> Any:
+        """Expected output of a generated test, computed by solution.py and cached on disk."""
+        key = generators.spec_key(test['function'], test['generate'], challenge.reference_code)
+        found, expected = self.cache.get_generated(key)
+        if not found:
+            expected = self._call_test(self._reference_namespace(challenge), test)[0]
+            self.cache.put_generated(key, expected)
+        return expected
+    
+    def _reference_time(self, challenge: ProgrammingChallenge, index: int, test: Dict[str, Any]) -> Optional[float]:
+        """Wall time of the problem's solution.py on one (resolved) test, or None."""
+        try:
+            namespace = self._reference_namespace(challenge)
+            if namespace is not None:
+                return self._call_test(namespace, test)[1]
+        except Exception as e:
+            logging.error(f"Reference solution for {challenge.name} failed on test {index + 1}: {e}")
+        return None
+
+    def analyze_complexity(self, challenge_id: str, solution_code: str) -> Dict[str, Any]:
+        """Estimate a solution's time complexity and compare it with solution.py's.
+
+        Runs in a sandbox process when the sandbox is enabled. Returns the
+        complexity.compare() response, or {'error', ...}.
+        """
+        if self.sandbox is not None:
+            return collect_analysis(self.sandbox.stream(challenge_id, solution_code, mode='analyze'))
+        return collect_analysis(self.iter_analysis(challenge_id, solution_code))
+    
+    def iter_analysis(self, challenge_id: str, solution_code: str) -> Iterator[Dict[str, Any]]:
+        """Run a complexity analysis in this process.
+
+        Yields a single {'type': 'done', 'analysis'} or {'type': 'error', 'error', ...}
+        event, so the sandbox can carry it like a grading run.
+        """
+        challenge = self.get_current_challenge(challenge_id)
+        if not challenge:
+            yield {'type': 'error', 'error': 'Challenge not found'}
+            return
+        spec = challenge.complexity
+        if spec is None:
+            yield {'type': 'error', 'error': f"Challenge {challenge_id} does not support complexity analysis"}
+            return
+        
+        # Before the submission runs, so it cannot tamper with the reference's timing
+        reference = self._reference_profile(challenge)
+        try:
+            namespace = {}
+            self._ran_submissions = True
+            exec(solution_code, namespace)
+            submission = complexity.profile(self._timer(namespace, spec['function']), spec)
+        except Exception as e:
+            yield {
+                'type': 'error',
                 'error': f"Error executing solution: {str(e)}",
                 'traceback': traceback.format_exc()
             }
+            return
+        yield {
+            'type': 'done',
+            'analysis': complexity.compare(submission, reference, spec.get('target'))
+        }
+    
+    def _timer(self, namespace: Dict[str, Any], function: str):
+        """Time one call of a solution's function on given arguments (copied untimed, as in grading)."""
+        return lambda arguments: self._call_test(namespace, {'function': function, 'input': arguments})[1]
+    
+    def _reference_profile(self, challenge: ProgrammingChallenge) -> Optional[Dict[str, Any]]:
+        """solution.py's complexity measurements, taken once per process.
 
+        Like prepare_challenge, measured in a fresh interpreter once this
+        process has executed a submission.
+        """
+        if challenge.reference_profile is None:
+            with self._prepare_lock:
+                if challenge.reference_profile is None:
+                    try:
+                        if self._ran_submissions:
+                            challenge.reference_profile = self._in_clean_process(challenge, 'profile')
+                        else:
+                            challenge.reference_profile = self._measure_reference_profile(challenge)
+                    except Exception as e:
+                        logging.error(f"Reference solution for {challenge.name} failed its complexity analysis: {e}")
+        return challenge.reference_profile
+    
+    def _measure_reference_profile(self, challenge: ProgrammingChallenge) -> Optional[Dict[str, Any]]:
+        """Profile solution.py in this process, or None without one. Only call in a process that ran no submission."""
+        namespace = self._reference_namespace(challenge)
+        if namespace is None:
+            return None
+        spec = challenge.complexity
+        return complexity.profile(self._timer(namespace, spec['function']), spec)
+    
+    def record_attempt(self, owner: str, challenge_id: str, passed: bool, solve_seconds: Optional[float] = None):
+        """Tell the selector how a user did on a challenge; solve_seconds runs from alarm trigger to solution."""
+        if challenge_id in self._manifest_set:
+            self.selector.record(owner, challenge_id, passed, solve_seconds)
+    
     def reload_challenges(self):
-        """Reload all challenges from disk."""
-        self.challenges.clear()
-        self.load_all_challenges()
+        """Reload all challenges from disk, replacing the sandbox workers, which hold their own copies."""
+        self.build_manifest()
+        self.results.clear()
+        if self.sandbox is not None:
+            from app.utils.sandbox import SandboxPool
+            # New jobs go to the new pool as its workers start; running ones finish on the old one
+            old_sandbox = self.sandbox
+            self.sandbox = SandboxPool(self.problems_dir, bundle_path=self.bundle_path, **self._sandbox_options)
+            old_sandbox.close(wait=old_sandbox.timeout)
     
     def list_challenges(self) -> List[str]:
         """Return a list of available challenge names."""
-        return sorted(self.challenges.keys())
+        return list(self.manifest)
     
     def get_challenge_count(self) -> int:
         """Return the number of available challenges."""
-        return len(self.challenges)
+        return len(self.manifest)
 
     def get_challenge_details(self, name: str) -> Optional[Dict]:
         """Get detailed information about a challenge."""
-        challenge = self.get_challenge(name)
+        challenge = self.get_current_challenge(name)
         if challenge:
             return challenge.to_dict()
         return None
+
+def _prepare_main():
+    """Entry point of the clean interpreter started by ChallengeManager._in_clean_process."""
+    problems_dir, bundle_path, cache_dir, name, task = pickle.load(sys.stdin.buffer)
+    manager = ChallengeManager(Path(problems_dir), Path(cache_dir), bundle_path=bundle_path and Path(bundle_path))
+    challenge = manager.get_challenge(name)
+    if challenge is None:
+        raise SystemExit(f"Challenge {name} could not be loaded")
+    if task == 'profile':
+        result = manager._measure_reference_profile(challenge)
+    else:
+        result = manager._reference_data(challenge)
+    sys.stdout.buffer.write(pickle.dumps((challenge.version, result), protocol=pickle.HIGHEST_PROTOCOL))
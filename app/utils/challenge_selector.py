@@ -0,0 +1,200 @@
+# app/utils/challenge_selector.py
+"""Strategies for picking the challenge an alarm asks for.
+
+A selector is built over the manifest (every challenge name) and can be
+swapped on ChallengeManager. Each draw costs the same however large the bank is.
+"""
+
+import random
+import threading
+from array import array
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+
+from app.models.alarm import DEFAULT_OWNER
+
+class FenwickTree:
+    """Prefix sums over non-negative weights: O(log n) updates and weighted draws.
+
+    Weights and sums are kept in unboxed double arrays, 16 bytes per item.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        self.size = len(weights)
+        self.weights = array('d', weights)
+        # Built in O(n) by pushing each node's sum up to its parent
+        self._tree = array('d', [0.0]) + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self._tree[parent] += self._tree[i]
+        self._top_bit = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    @property
+    def total(self) -> float:
+        total, i = 0.0, self.size
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def set(self, index: int, weight: float):
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, target: float) -> int:
+        """The index whose weight span contains target, for 0 <= target < total."""
+        position, step = 0, self._top_bit
+        while step:
+            following = position + step
+            if following <= self.size and self._tree[following] <= target:
+                position = following
+                target -= self._tree[following]
+            step >>= 1
+        # Float rounding can walk past the last item (or onto a zero weight at the end)
+        return min(position, self.size - 1)
+
+    def sample(self, rng: random.Random) -> int:
+        return self.find(rng.random() * self.total)
+
+class ChallengeSelector(ABC):
+    """Picks challenges for a user; subclasses decide how."""
+
+    def __init__(self, names: Sequence[str] = (), rng: Optional[random.Random] = None):
+        self.rng = rng or random.Random()
+        self.reset(names)
+
+    def reset(self, names: Sequence[str]):
+        """Start selecting from a new manifest."""
+        self.names = list(names)
+
+    @abstractmethod
+    def choose(self, owner: str = DEFAULT_OWNER) -> str:
+        """A challenge name for the user's next alarm; raises ValueError if there are none."""
+
+    def record(self, owner: str, challenge_id: str, passed: bool, solve_seconds: Optional[float] = None):
+        """Learn from a submission graded for the user's alarm. Ignored unless the selector adapts to the user."""
+
+class UniformSelector(ChallengeSelector):
+    """Every challenge is equally likely."""
+
+    def choose(self, owner: str = DEFAULT_OWNER) -> str:
+        if not self.names:
+            raise ValueError("No challenges available")
+        return self.rng.choice(self.names)
+
+class ChallengeStats:
+    __slots__ = ('attempts', 'failures', 'solves', 'streak', 'solve_seconds')
+
+    def __init__(self, attempts: int, failures: int, solves: int, streak: int, solve_seconds: Optional[float]):
+        self.attempts = attempts
+        self.failures = failures
+        self.solves = solves
+        self.streak = streak
+        self.solve_seconds = solve_seconds
+
+class SpacedRepetitionSelector(ChallengeSelector):
+    """Favors the challenges a user finds hard, using their history in the alarm store.
+
+    Unseen challenges get weight 1, and so do ones never yet solved at an
+    alarm. Each consecutive pass halves a challenge's weight, so it comes
+    back at growing intervals. Failures and slow solves raise it again. Per-user weights live in a FenwickTree,
+    built on the user's first draw and updated in O(log n) as history changes.
+    Only the MAX_TREES most recently drawing users keep a tree; the others
+    are rebuilt from their history on their next draw.
+    """
+    NEW_WEIGHT = 1.0
+    MIN_WEIGHT = 0.02
+    # Solve time (alarm trigger to passing submission) considered normal
+    TARGET_SOLVE_SECONDS = 120.0
+    # Passes in a row beyond which the weight stops shrinking
+    MAX_STREAK = 6
+    # Users whose FenwickTree stays built (each is 16 bytes per challenge)
+    MAX_TREES = 256
+
+    def __init__(self, store, names: Sequence[str] = (), rng: Optional[random.Random] = None):
+        self.store = store
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, ChallengeStats]] = {}  # owner -> challenge -> stats
+        self._seen_seq = 0
+        super().__init__(names, rng)
+
+    def reset(self, names: Sequence[str]):
+        with self._lock:
+            self.names = list(names)
+            self._index = {name: i for i, name in enumerate(self.names)}
+            # owner -> tree; least recent draw first
+            self._trees: 'OrderedDict[str, FenwickTree]' = OrderedDict()
+
+    @classmethod
+    def weight(cls, stats: Optional[ChallengeStats]) -> float:
+        if stats is None or not stats.attempts:
+            return cls.NEW_WEIGHT
+        failure_rate = stats.failures / stats.attempts
+        slowness = 1.0
+        if stats.solve_seconds is not None:
+            slowness = min(max(stats.solve_seconds / cls.TARGET_SOLVE_SECONDS, 0.5), 4.0)
+        weight = 0.5 ** min(stats.streak, cls.MAX_STREAK) * (1 + 3 * failure_rate) * slowness
+        if not stats.solves:
+            weight = max(weight, cls.NEW_WEIGHT)
+        return max(cls.MIN_WEIGHT, weight)
+
+    def choose(self, owner: str = DEFAULT_OWNER) -> str:
+        with self._lock:
+            if not self.names:
+                raise ValueError("No challenges available")
+            self._sync()
+            tree = self._trees.get(owner)
+            if tree is None:
+                tree = self._trees[owner] = self._build_tree(owner)
+                while len(self._trees) > self.MAX_TREES:
+                    self._trees.popitem(last=False)
+            else:
+                self._trees.move_to_end(owner)
+            return self.names[tree.sample(self.rng)]
+
+    def record(self, owner: str, challenge_id: str, passed: bool, solve_seconds: Optional[float] = None):
+        self.store.record_attempt(owner, challenge_id, passed, solve_seconds)
+        with self._lock:
+            self._sync()
+
+    def _build_tree(self, owner: str) -> FenwickTree:
+        """Caller holds self._lock."""
+        # Only challenges with history differ from NEW_WEIGHT
+        weights = array('d', [self.NEW_WEIGHT]) * len(self.names)
+        for challenge_id, stats in self._stats.get(owner, {}).items():
+            index = self._index.get(challenge_id)
+            if index is not None:
+                weights[index] = self.weight(stats)
+        return FenwickTree(weights)
+
+    def _sync(self):
+        """Apply history recorded (by any process) since the last sync. Caller holds self._lock."""
+        if self.store.stats_generation() == self._seen_seq:
+            return
+        for owner, challenge_id, attempts, failures, solves, streak, solve_seconds, seq in \
+                self.store.load_stats_since(self._seen_seq):
+            stats = ChallengeStats(attempts, failures, solves, streak, solve_seconds)
+            self._stats.setdefault(owner, {})[challenge_id] = stats
+            tree, index = self._trees.get(owner), self._index.get(challenge_id)
+            if tree is not None and index is not None:
+                tree.set(index, self.weight(stats))
+            self._seen_seq = seq
+
+SELECTORS = {
+    'uniform': UniformSelector,
+    'spaced': SpacedRepetitionSelector
+}
+
+def make_selector(kind: str, store=None, names: List[str] = ()) -> ChallengeSelector:
+    """Build a selector by its config name (see CHALLENGE_SELECTOR)."""
+    if kind not in SELECTORS:
+        raise ValueError(f"Unknown challenge selector {kind!r}; expected one of {', '.join(SELECTORS)}")
+    if kind == 'spaced':
+        return SpacedRepetitionSelector(store, names)
+    return SELECTORS[kind](names)
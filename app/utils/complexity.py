@@ -0,0 +1,231 @@
+# app/utils/complexity.py
+"""Empirical time complexity: time a function over growing inputs and fit the curve.
+
+A challenge opts in with a `complexity` section in tests.yaml (dict form),
+whose generator parameters use `n` for the input size:
+
+    complexity:
+      function: sort_list
+      generate:
+        numbers: {type: int_list, size: n, seed: 1}
+      target: O(n log n)        # Optional; reported as meets_target
+      enforce: true             # Optional; grading then fails correct solutions missing the target
+      sizes: [1024, 4096, ...]  # Optional; default MIN_SIZE doubling up to MAX_SIZE
+
+Each class is fitted as time = c * f(n) by least squares on log time; the
+class with the smallest residual wins. Caches make large inputs slower per
+item on real machines, so a linear solution can fit O(n log n); comparing
+against solution.py, which suffers the same, is what decides meets_target.
+"""
+
+import gc
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.utils import generators
+
+# From slowest growing to fastest; meeting a target means fitting it or an earlier class
+COMPLEXITY_CLASSES = (
+    ('O(1)', lambda n: 1.0),
+    ('O(log n)', lambda n: math.log2(n)),
+    ('O(n)', lambda n: float(n)),
+    ('O(n log n)', lambda n: n * math.log2(n)),
+    ('O(n^2)', lambda n: float(n) ** 2),
+    ('O(n^3)', lambda n: float(n) ** 3),
+)
+CLASS_NAMES = [name for name, _ in COMPLEXITY_CLASSES]
+
+# Default size series; small enough that quadratic solutions still reach MIN_POINTS sizes
+MIN_SIZE = 128
+MAX_SIZE = 2 ** 18
+# Wall time (including input generation) one solution may spend being measured;
+# larger sizes are skipped once it runs out
+DEFAULT_BUDGET = 2.0
+# Fewer sizes than this cannot tell the classes apart
+MIN_POINTS = 4
+# Each size is re-run until this much time is spent, keeping the fastest run
+MIN_SAMPLE_SECONDS = 0.02
+MAX_SAMPLE_RUNS = 5
+
+# Submission-to-reference time ratios growing slower than n ** this count as the same growth;
+# a log factor over the default sizes stays well under it, an extra factor of n is near 1
+SAME_GROWTH_EXPONENT = 0.35
+
+SIZE_PLACEHOLDER = 'n'
+
+def _normalize(name: str) -> str:
+    name = name.replace(' ', '').replace('*', '').replace('²', '^2').replace('³', '^3').lower()
+    if name.startswith('o(') and name.endswith(')'):
+        name = name[2:-1]
+    return {'n2': 'n^2', 'n3': 'n^3'}.get(name, name)
+
+_BY_NORMALIZED = {_normalize(name): name for name in CLASS_NAMES}
+
+def parse_class(name: Any) -> str:
+    """Canonical class name for a spelling like "O(n log n)", "n log n" or "nlogn"; raises ValueError."""
+    canonical = _BY_NORMALIZED.get(_normalize(name)) if isinstance(name, str) else None
+    if canonical is None:
+        raise ValueError(f"Unknown complexity class {name!r}; expected one of {', '.join(CLASS_NAMES)}")
+    return canonical
+
+def _uses_size(spec: Dict[str, Any]) -> bool:
+    return any(
+        isinstance(value, dict) and SIZE_PLACEHOLDER in value.values()
+        for value in spec.values()
+    )
+
+def validate_spec(spec: Any, where: str):
+    """Check a tests.yaml `complexity` section."""
+    if not isinstance(spec, dict):
+        raise ValueError(f"complexity for {where} must be a mapping")
+    missing = {'function', 'generate'} - spec.keys()
+    if missing:
+        raise ValueError(f"complexity for {where} missing required keys: {missing}")
+    generators.validate_spec(spec['generate'], f"complexity in {where}")
+    if not _uses_size(spec['generate']):
+        raise ValueError(f"complexity generate for {where} must use {SIZE_PLACEHOLDER!r} for a generator size")
+    if 'target' in spec:
+        parse_class(spec['target'])
+    if not isinstance(spec.get('enforce', False), bool):
+        raise ValueError(f"complexity enforce for {where} must be true or false")
+    if spec.get('enforce') and 'target' not in spec:
+        raise ValueError(f"complexity for {where} can only enforce a target it declares")
+    sizes = spec.get('sizes')
+    if sizes is not None and (
+            not isinstance(sizes, list) or len(sizes) < MIN_POINTS
+            or not all(isinstance(size, int) and size > 1 for size in sizes)):
+        raise ValueError(f"complexity sizes for {where} must be a list of at least {MIN_POINTS} sizes above 1")
+
+def default_sizes() -> List[int]:
+    sizes, size = [], MIN_SIZE
+    while size <= MAX_SIZE:
+        sizes.append(size)
+        size *= 2
+    return sizes
+
+def generate_input(spec: Dict[str, Any], size: int) -> Dict[str, Any]:
+    """Keyword arguments for one size: the `generate` mapping with `n` replaced."""
+    sized = {
+        argument: {key: size if param == SIZE_PLACEHOLDER else param for key, param in value.items()}
+        if isinstance(value, dict) else value
+        for argument, value in spec.items()
+    }
+    return generators.generate_input(sized)
+
+def _slope(sizes: Sequence[int], values: Sequence[float]) -> float:
+    """Least-squares slope of log value against log size."""
+    log_sizes = [math.log(size) for size in sizes]
+    log_values = [math.log(max(value, 1e-9)) for value in values]
+    mean_size, mean_value = sum(log_sizes) / len(log_sizes), sum(log_values) / len(log_values)
+    spread = sum((x - mean_size) ** 2 for x in log_sizes)
+    return sum((x - mean_size) * (y - mean_value) for x, y in zip(log_sizes, log_values)) / spread
+
+def fit(sizes: Sequence[int], times: Sequence[float]) -> Dict[str, Any]:
+    """Fit every complexity class to the measurements; returns the best one and how each did.
+
+    `exponent` is the slope of log time against log size: about 1 for
+    linear, 2 for quadratic, a little over 1 for n log n.
+    """
+    log_times = [math.log(max(seconds, 1e-9)) for seconds in times]
+    fits = {}
+    for name, growth in COMPLEXITY_CLASSES:
+        residuals = [log_time - math.log(growth(size)) for size, log_time in zip(sizes, log_times)]
+        log_constant = sum(residuals) / len(residuals)
+        error = math.sqrt(sum((r - log_constant) ** 2 for r in residuals) / len(residuals))
+        fits[name] = {'constant': math.exp(log_constant), 'error': error}
+    best = min(CLASS_NAMES, key=lambda name: fits[name]['error'])
+    return {
+        'complexity': best,
+        'constant': fits[best]['constant'],
+        'exponent': round(_slope(sizes, times), 2),
+        'fits': {name: round(fits[name]['error'], 4) for name in CLASS_NAMES}
+    }
+
+def profile(run: Callable[[Dict[str, Any]], float], spec: Dict[str, Any],
+            budget: float = DEFAULT_BUDGET) -> Dict[str, Any]:
+    """Measure run(arguments) -> seconds over the size series and fit the result.
+
+    Sizes are tried in increasing order until the budget is spent or the
+    next size (at least as slow as the last) would overrun it. As with
+    timeit, the garbage collector is off while run() is timed.
+    """
+    sizes, times = [], []
+    started = time.perf_counter()
+    for size in sorted(spec.get('sizes') or default_sizes()):
+        size_started = time.perf_counter()
+        arguments = generate_input(spec['generate'], size)
+        best, runs, sampled = math.inf, 0, 0.0
+        while runs < MAX_SAMPLE_RUNS and (runs == 0 or sampled < MIN_SAMPLE_SECONDS):
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                seconds = run(arguments)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            best, runs, sampled = min(best, seconds), runs + 1, sampled + seconds
+        sizes.append(size)
+        times.append(best)
+        # Predict the next size from the growth seen so far (sizes at least double)
+        now = time.perf_counter()
+        growth = times[-1] / times[-2] if len(times) > 1 and times[-2] > 0 else 2.0
+        if now - started + (now - size_started) * max(growth, 2.0) > budget:
+            break
+
+    result = {'sizes': sizes, 'times': times, 'complexity': None, 'constant': None, 'exponent': None}
+    if len(sizes) >= MIN_POINTS:
+        result.update(fit(sizes, times))
+    return result
+
+def compare(submission: Dict[str, Any], reference: Optional[Dict[str, Any]],
+            target: Optional[str]) -> Dict[str, Any]:
+    """The analysis response: both profiles, how they compare and the target check.
+
+    relative_exponent is the growth of submission time over reference time
+    (0 when both grow alike, about 1 for an extra factor of n). When they
+    grow alike, constant_ratio is the ratio of their fitted constants.
+    slowdown is the plain time ratio at the largest size both reached.
+    solution.py is taken to meet the target, so a submission meets it by
+    fitting the target class or better, or by growing like the reference.
+    """
+    analysis = {
+        'submission': submission,
+        'reference': reference,
+        'target': target,
+        'meets_target': None,
+        'relative_exponent': None,
+        'grows_like_reference': None,
+        'constant_ratio': None,
+        'slowdown': None,
+        'slowdown_size': None
+    }
+    if reference is not None:
+        reference_times = dict(zip(reference['sizes'], reference['times']))
+        common = [(size, seconds, reference_times[size])
+                  for size, seconds in zip(submission['sizes'], submission['times'])
+                  if reference_times.get(size)]
+        if common:
+            size, submission_time, reference_time = common[-1]
+            analysis['slowdown'] = round(submission_time / reference_time, 2)
+            analysis['slowdown_size'] = size
+        if len(common) >= MIN_POINTS:
+            relative_exponent = _slope([size for size, _, _ in common],
+                                       [sub / ref for _, sub, ref in common])
+            analysis['relative_exponent'] = round(relative_exponent, 2)
+            analysis['grows_like_reference'] = relative_exponent < SAME_GROWTH_EXPONENT
+            if analysis['grows_like_reference'] and reference['constant'] is not None:
+                # The reference's class and constant stand for both, which the caches affect alike
+                growth = dict(COMPLEXITY_CLASSES)[reference['complexity']]
+                ratios = [sub / (reference['constant'] * growth(size)) for size, sub, _ in common]
+                analysis['constant_ratio'] = round(math.exp(sum(map(math.log, ratios)) / len(ratios)), 2)
+
+    if target is not None:
+        fitted = submission['complexity']
+        if fitted is not None and CLASS_NAMES.index(fitted) <= CLASS_NAMES.index(target):
+            analysis['meets_target'] = True
+        elif analysis['grows_like_reference'] is not None:
+            analysis['meets_target'] = analysis['grows_like_reference']
+        elif fitted is not None:
+            analysis['meets_target'] = False
+    return analysis
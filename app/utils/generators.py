@@ -0,0 +1,87 @@
+# app/utils/generators.py
+
+import hashlib
+import json
+import random
+from typing import Any, Callable, Dict, List
+
+def int_list(size: int, seed: int, low: int = -10**9, high: int = 10**9) -> List[int]:
+    """A list of `size` random integers in [low, high]."""
+    rng = random.Random(seed)
+    return [rng.randint(low, high) for _ in range(size)]
+
+def graph(nodes: int, seed: int, edges: int = None) -> Dict[int, List[int]]:
+    """A random undirected graph on nodes 0..nodes-1 as an adjacency list.
+
+    Defaults to 2 * nodes edges; neighbor order follows edge generation order.
+    """
+    rng = random.Random(seed)
+    adjacency: Dict[int, List[int]] = {node: [] for node in range(nodes)}
+    if nodes < 2:
+        return adjacency
+    for _ in range(2 * nodes if edges is None else edges):
+        u = rng.randrange(nodes)
+        v = rng.randrange(nodes - 1)
+        if v >= u:  # Avoid self loops without rejection sampling
+            v += 1
+        adjacency[u].append(v)
+        adjacency[v].append(u)
+    return adjacency
+
+GENERATORS: Dict[str, Callable[..., Any]] = {
+    'int_list': int_list,
+    'graph': graph
+}
+
+def validate_spec(spec: Any, where: str):
+    """Check a test's `generate` mapping: argument -> literal or {type: <generator>, ...}."""
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError(f"generate for {where} must be a mapping of argument names")
+    for argument, value in spec.items():
+        if isinstance(value, dict):
+            kind = value.get('type')
+            if kind not in GENERATORS:
+                raise ValueError(
+                    f"Unknown generator {kind!r} for argument {argument} in {where}; "
+                    f"expected one of {sorted(GENERATORS)}"
+                )
+            if 'seed' not in value:
+                raise ValueError(f"Generator for argument {argument} in {where} needs a seed")
+
+def generate_input(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Materialize a `generate` mapping into keyword arguments."""
+    arguments = {}
+    for argument, value in spec.items():
+        if isinstance(value, dict):
+            params = {key: param for key, param in value.items() if key != 'type'}
+            arguments[argument] = GENERATORS[value['type']](**params)
+        else:
+            arguments[argument] = value
+    return arguments
+
+def describe_input(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Short human-readable form of a `generate` mapping, shown instead of the data."""
+    described = {}
+    for argument, value in spec.items():
+        if isinstance(value, dict):
+            params = ', '.join(f"{key}={param}" for key, param in value.items() if key != 'type')
+            described[argument] = f"{value['type']}({params})"
+        else:
+            described[argument] = value
+    return described
+
+def spec_key(function: str, spec: Dict[str, Any], reference_code: str) -> str:
+    """Stable cache key for the expected output of a generated test."""
+    payload = json.dumps({'function': function, 'generate': spec}, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode('utf-8'))
+    digest.update(reference_code.encode('utf-8'))
+    return digest.hexdigest()
+
+def summarize(value: Any, limit: int = 20) -> Any:
+    """Return small values unchanged; shorten long lists/dicts for display."""
+    if isinstance(value, list) and len(value) > limit:
+        head = ', '.join(repr(item) for item in value[:limit // 2])
+        return f"[{head}, ...] ({len(value)} items)"
+    if isinstance(value, dict) and len(value) > limit:
+        return f"{{...}} ({len(value)} entries)"
+    return value
@@ -0,0 +1,253 @@
+# app/utils/grading_queue.py
+
+import logging
+import queue
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.utils.challenge_manager import collect_results
+
+class QueueFull(Exception):
+    """Raised by GradingQueue.submit when every queue slot is taken."""
+
+class GradingJob:
+    """One submitted solution: its result events as they arrive, then its results.
+
+    A 'grade' job runs the tests; an 'analyze' job estimates the solution's
+    time complexity, its results being the analysis.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    GRADE = 'grade'
+    ANALYZE = 'analyze'
+
+    def __init__(self, challenge_id: str, solution: str, fail_fast: bool = False,
+                 on_graded: Optional[Callable[[Dict[str, Any]], None]] = None, mode: str = GRADE):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.challenge_id = challenge_id
+        self.solution = solution
+        self.fail_fast = fail_fast
+        self.on_graded = on_graded
+        self.status = self.QUEUED
+        self.events: List[Dict[str, Any]] = []
+        self.tests_completed = 0
+        self.results: Optional[Dict[str, Any]] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.finished = threading.Event()
+        self.changed = threading.Condition()
+        self.save_lock = threading.Lock()  # Orders write-throughs to the shared store
+
+    def add_event(self, event: Dict[str, Any]):
+        with self.changed:
+            self.events.append(event)
+            if event['type'] == 'result':
+                self.tests_completed += 1
+            self.changed.notify_all()
+
+    def finish(self, status: str, results: Dict[str, Any]):
+        with self.changed:
+            self.results = results
+            self.status = status
+            self.finished_at = time.time()
+            self.solution = None  # No longer needed; jobs are kept around for polling
+            self.finished.set()
+            self.changed.notify_all()
+
+    def iter_events(self) -> Iterator[Dict[str, Any]]:
+        """Yield every result event, blocking for new ones until the job finishes."""
+        index = 0
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: index < len(self.events) or self.finished.is_set())
+                new_events = self.events[index:]
+                finished = self.finished.is_set()
+            index += len(new_events)
+            yield from new_events
+            if finished and not new_events:
+                return
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = {
+            'job_id': self.id,
+            'mode': self.mode,
+            'status': self.status,
+            'challenge_id': self.challenge_id,
+            'tests_completed': self.tests_completed,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.results is not None:
+            state['results'] = self.results
+        return state
+
+class GradingQueue:
+    """Bounded queue of grading jobs served by a fixed pool of executor threads.
+
+    Executors only drive the grading: with the sandbox enabled, solutions
+    run in sandbox worker processes. Given a store (serve.py), job states
+    are written through to it, so any server process can answer a poll.
+    """
+    # How often a wait on another process's job re-reads the store
+    POLL_INTERVAL = 0.2
+    # How often finished jobs past their retention are dropped
+    PRUNE_INTERVAL = 30.0
+
+    def __init__(self, challenge_manager, workers: int = 2, max_pending: int = 32,
+                 retention: float = 300.0, store=None):
+        self.challenge_manager = challenge_manager
+        self.workers = workers
+        self.retention = retention
+        self.store = store
+        self._queue: 'queue.Queue[Optional[GradingJob]]' = queue.Queue(maxsize=max_pending)
+        self._jobs: Dict[str, GradingJob] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+
+    def start(self):
+        """Start the executor threads."""
+        for index in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._run, name=f"grading-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Grading queue started with {self.workers} executors")
+
+    def stop(self, timeout: float = 10.0):
+        """Let queued jobs finish, then stop the executors, waiting up to timeout seconds in all."""
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                logging.warning(f"Grading queue still full after {timeout}s; leaving its executors running")
+                break
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def submit(self, challenge_id: str, solution: str, fail_fast: bool = False,
+               on_graded: Optional[Callable[[Dict[str, Any]], None]] = None,
+               mode: str = GradingJob.GRADE) -> GradingJob:
+        """Queue a solution for grading (or, with mode 'analyze', complexity analysis).
+
+        on_graded gets the results (on an executor) before the job finishes.
+        """
+        self._prune()
+        job = GradingJob(challenge_id, solution, fail_fast, on_graded, mode)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFull(f"{self._queue.maxsize} submissions are already waiting") from None
+        self._save(job)
+        return job
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's current state, or None if unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.load_job(job_id) if self.store is not None else None
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Like get, but first waits up to timeout seconds for the job to finish."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job.finished.wait(timeout)
+            return job.to_dict()
+        if self.store is None:
+            return None
+
+        # Submitted to another server process: watch its state in the store
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.store.load_job(job_id)
+            remaining = deadline - time.monotonic()
+            if state is None or state['status'] in (GradingJob.DONE, GradingJob.FAILED) or remaining <= 0:
+                return state
+            time.sleep(min(self.POLL_INTERVAL, remaining))
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._grade(job)
+            except Exception as e:
+                logging.error(f"Grading job {job.id} failed: {e}")
+                job.add_event({'type': 'error', 'error': str(e)})
+                job.finish(GradingJob.FAILED, {
+                    'error': str(e),
+                    'traceback': traceback.format_exc()
+                })
+            self._save(job)
+
+    def _grade(self, job: GradingJob):
+        job.status = GradingJob.RUNNING
+        job.started_at = time.time()
+        self._save(job)
+
+        if job.mode == GradingJob.ANALYZE:
+            job.finish(GradingJob.DONE, self.challenge_manager.analyze_complexity(job.challenge_id, job.solution))
+            return
+
+        events = []
+        for event in self.challenge_manager.stream_solution(job.challenge_id, job.solution, job.fail_fast):
+            events.append(event)
+            if event['type'] == 'result':
+                job.add_event(event)
+        results = collect_results(events)
+
+        # Runs before anyone can see the job finish, so a solved alarm is already cleared
+        if job.on_graded is not None:
+            try:
+                job.on_graded(results)
+            except Exception as e:
+                logging.error(f"Handling the results of grading job {job.id} failed: {e}")
+        if events and events[-1]['type'] != 'result':
+            job.add_event(events[-1])  # The closing 'done' or 'error' event
+        job.finish(GradingJob.DONE, results)
+
+    def _save(self, job: GradingJob):
+        """Write the job's latest state through to the shared store, if any."""
+        if self.store is None:
+            return
+        # Serialized per job and read under the lock, so the last write is always the newest state
+        with job.save_lock:
+            self.store.save_job(job.id, job.to_dict())
+
+    def _prune(self):
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.store is not None:
+            self.store.prune_jobs(cutoff)
@@ -0,0 +1,89 @@
+# app/utils/http_cache.py
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Optional; responses are still served gzip-compressed
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """The body under every content coding we can serve, keyed by Content-Encoding."""
+    variants = {'identity': body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(body)
+    return variants
+
+def not_modified(etag: str) -> Optional[Response]:
+    """A 304 response if the request's If-None-Match already holds etag (weakly compared)."""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+class _Entry:
+    __slots__ = ('etag', 'variants', 'mimetype')
+
+    def __init__(self, etag: str, variants: Dict[str, bytes], mimetype: str):
+        self.etag = etag
+        self.variants = variants
+        self.mimetype = mimetype
+
+    def to_response(self) -> Response:
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in self.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+
+        response = Response(self.variants[encoding], mimetype=self.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Clients may store the response but must revalidate it (cheaply, via the ETag)
+        response.headers['Cache-Control'] = 'no-cache'
+        # Weak, since every encoding's bytes share it (If-None-Match compares weakly anyway)
+        response.set_etag(self.etag, weak=True)
+        return response
+
+class ResponseCache:
+    """Rendered, pre-compressed response bodies, each valid for one ETag.
+
+    ETags come from generation counters, so checking freshness never
+    requires rebuilding the body.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def respond(self, key: Hashable, etag: str, build: Callable[[], bytes],
+                mimetype: str = 'application/json') -> Response:
+        """Answer 304 if the client is current, else serve the cached body for etag, building it once."""
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None or entry.etag != etag:
+            entry = _Entry(etag, compress_variants(build()), mimetype)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry.to_response()
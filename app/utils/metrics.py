@@ -0,0 +1,218 @@
+# app/utils/metrics.py
+"""Latency histograms exposed in the Prometheus text format at /metrics.
+
+Recording never takes a lock: every thread writes into its own shard, and
+only a scrape merges the shards. A thread's shard is handed on to a later
+thread once it exits, so the shard count follows the peak thread count
+rather than the number of requests served. Series are per process; under serve.py
+each worker reports its own.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+# Seconds; spans sub-millisecond lock waits up to slow grading runs
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+class Histogram:
+    """A histogram with optional labels, safe to observe from any thread without locking.
+
+    A series is a list of per-bucket counts (the last bucket is +Inf)
+    followed by the sum. Only the owning thread writes a shard; collect()
+    copies each shard and series, which the GIL makes atomic. Taking,
+    freeing and registering shards are single deque/list operations, also
+    atomic, so a new thread does not lock either.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple, List]] = []  # Every shard, in use or free
+        self._free: 'deque[Dict[Tuple, List]]' = deque()  # Shards of exited threads
+
+    def _shard(self) -> Dict[Tuple, List]:
+        try:
+            return self._local.lease.shard
+        except AttributeError:
+            try:
+                shard = self._free.pop()  # Counts are cumulative, so they carry over
+            except IndexError:
+                shard = {}
+                self._shards.append(shard)
+            self._local.lease = _ShardLease(shard, self._free)
+            return shard
+
+    def observe(self, value: float, *labels: str):
+        """Record one value; labels are given positionally, in labelnames order."""
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels: str) -> '_Timer':
+        """Context manager observing the wall time of its block."""
+        return _Timer(self, labels)
+
+    @staticmethod
+    def _merge(into: Dict[Tuple, List], shard: Dict[Tuple, List]):
+        for labels, series in dict(shard).items():
+            series = list(series)
+            total = into.get(labels)
+            if total is None:
+                into[labels] = series
+            else:
+                for i, value in enumerate(series):
+                    total[i] += value
+
+    def collect(self) -> Dict[Tuple, List]:
+        """Merged series of every thread: {labels: [bucket counts..., sum]}."""
+        merged: Dict[Tuple, List] = {}
+        for shard in list(self._shards):
+            self._merge(merged, shard)
+        return merged
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram"
+        ]
+        bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+        for labels, series in sorted(self.collect().items()):
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {cumulative}")
+        return lines
+
+class _ShardLease:
+    """A thread's hold on its shard; freed with the thread's locals when it exits."""
+    __slots__ = ('shard', 'free')
+
+    def __init__(self, shard: Dict[Tuple, List], free: 'deque[Dict[Tuple, List]]'):
+        self.shard = shard
+        self.free = free
+
+    def __del__(self):
+        self.free.append(self.shard)
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+class InstrumentedLock:
+    """threading.Lock that records how long acquiring it waited and how long it was held."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0  # Only written by the holder
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        now = time.perf_counter()
+        LOCK_WAIT_SECONDS.observe(now - start, self.name)
+        if acquired:
+            self._acquired_at = now
+        return acquired
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self._lock.release()
+        LOCK_HOLD_SECONDS.observe(held, self.name)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+class Registry:
+    """Every histogram served at /metrics, by name."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+ALARM_TICK_SECONDS = REGISTRY.histogram(
+    'alarm_worker_tick_seconds',
+    "Time AlarmWorker.tick spends handling due alarms and inactivity, excluding its wait"
+)
+ALARM_TRIGGER_LAG_SECONDS = REGISTRY.histogram(
+    'alarm_trigger_lag_seconds',
+    "Delay between an alarm's scheduled minute and when it fired"
+)
+LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    'lock_wait_seconds', "Time spent waiting to acquire an instrumented lock", ('lock',)
+)
+LOCK_HOLD_SECONDS = REGISTRY.histogram(
+    'lock_hold_seconds', "Time an instrumented lock was held", ('lock',)
+)
+GRADING_SECONDS = REGISTRY.histogram(
+    'challenge_grading_seconds',
+    "Time to grade a submission, by challenge and where it ran (inline, sandbox or cache)",
+    ('challenge', 'source')
+)
+TEST_CASE_SECONDS = REGISTRY.histogram(
+    'challenge_test_case_seconds',
+    "Wall time of a submission on one test case", ('challenge', 'test')
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    "Time to produce a response, by endpoint, method and status", ('endpoint', 'method', 'status')
+)
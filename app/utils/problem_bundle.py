@@ -0,0 +1,127 @@
+# app/utils/problem_bundle.py
+"""Packed problem banks: every challenge compiled into one memory-mapped file.
+
+Layout: a fixed header (magic, payload format, table-of-contents offset
+and length), the pickled compiled challenges back to back, then the table
+of contents: the sorted names joined by newlines, followed by one fixed-size
+(offset, length, digest) record per name. Opening a bundle reads only the
+header and the names; records are unpacked and challenges unpickled on
+first use.
+
+Build one from a problems directory (see PROBLEM_BUNDLE in config.py):
+    python -m app.utils.problem_bundle                      # app/problems -> problems.bundle
+    python -m app.utils.problem_bundle --output bank.bundle --problems path/to/problems
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import sys
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from app.utils.challenge_cache import ChallengeCache
+
+MAGIC = b'PBUNDLE1'
+HEADER = struct.Struct('<8sIQQ')  # magic, payload format (ChallengeCache.FORMAT_VERSION), TOC offset, TOC length
+NAMES_LENGTH = struct.Struct('<Q')  # Starts the TOC
+RECORD = struct.Struct('<QQ8s')  # Payload offset, length and content digest, in name order
+
+class ProblemBundle:
+    """Read side of a packed problem bank."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            # The mapping outlives the file object; a rebuilt bundle replaces the file, not its pages
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, payload_format, toc_offset, _ = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not a problem bundle")
+            if payload_format != ChallengeCache.FORMAT_VERSION:
+                raise ValueError(f"{self.path} was built by an incompatible version; rebuild it")
+            names_length, = NAMES_LENGTH.unpack_from(self._map, toc_offset)
+            names_start = toc_offset + NAMES_LENGTH.size
+            names = self._map[names_start:names_start + names_length].decode('utf-8')
+        except Exception:
+            self._map.close()
+            raise
+        self.names = names.split('\n') if names else []  # Sorted at build time
+        self._records_start = names_start + names_length
+
+    def _find(self, name: str) -> int:
+        index = bisect_left(self.names, name)
+        if index == len(self.names) or self.names[index] != name:
+            raise KeyError(name)
+        return index
+
+    def __contains__(self, name: str) -> bool:
+        try:
+            self._find(name)
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def load(self, name: str) -> Tuple[Tuple, Dict[str, Any]]:
+        """Decode one challenge; returns (version, compiled payload as ChallengeCache stores it)."""
+        offset, length, digest = RECORD.unpack_from(self._map, self._records_start + self._find(name) * RECORD.size)
+        return ('bundle', digest.hex()), pickle.loads(self._map[offset:offset + length])
+
+    def close(self):
+        self._map.close()
+
+def build_bundle(problems_dir: Path, output: Path) -> int:
+    """Compile every problem directory into a bundle at output; returns the problem count."""
+    from app.utils.challenge_manager import ChallengeManager
+
+    manager = ChallengeManager(problems_dir)
+    names = sorted(manager.manifest)
+    records = []
+    tmp_path = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, 0, 0))  # Filled in once the TOC position is known
+            for name in names:
+                payload = pickle.dumps(manager._compile_challenge(problems_dir / name),
+                                       protocol=pickle.HIGHEST_PROTOCOL)
+                records.append(RECORD.pack(f.tell(), len(payload), hashlib.sha256(payload).digest()[:8]))
+                f.write(payload)
+
+            names_blob = '\n'.join(names).encode('utf-8')
+            toc = NAMES_LENGTH.pack(len(names_blob)) + names_blob + b''.join(records)
+            toc_offset = f.tell()
+            f.write(toc)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, ChallengeCache.FORMAT_VERSION, toc_offset, len(toc)))
+        # Atomic, so running servers keep reading their mapping of the old bundle
+        os.replace(tmp_path, output)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return len(names)
+
+def main(argv=None):
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--problems', type=Path, default=Config.PROBLEMS_DIR,
+                        help="problems directory to pack (default: app/problems)")
+    parser.add_argument('--output', type=Path, default=Config.PROBLEM_BUNDLE or Config.BASE_DIR / 'problems.bundle',
+                        help="bundle to write (default: PROBLEM_BUNDLE, else problems.bundle)")
+    args = parser.parse_args(argv)
+
+    count = build_bundle(args.problems, args.output)
+    print(f"Packed {count} problems into {args.output} ({args.output.stat().st_size} bytes)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# app/utils/sandbox.py
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; limits are skipped there
+    resource = None
+
+def _apply_memory_limit(memory_limit: Optional[int]):
+    if resource and memory_limit:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            memory_limit = min(memory_limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+def _apply_cpu_limit(cpu_seconds: Optional[int]):
+    """Allow this process cpu_seconds more CPU time before SIGXCPU kills it."""
+    if resource and cpu_seconds:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _worker_main(conn, problems_dir: str, bundle_path: Optional[str], memory_limit: Optional[int]):
+    """Entry point of a sandbox process: index the challenges, then grade jobs until closed.
+
+    Challenges load on first use. Their reference data comes with the
+    first job for each one, prepared by the parent, which never runs
+    submissions; this process could not compute it untainted after its
+    first job.
+    """
+    from app.utils.challenge_manager import ChallengeManager
+
+    manager = ChallengeManager(problems_dir=Path(problems_dir), bundle_path=bundle_path and Path(bundle_path))
+    _apply_memory_limit(memory_limit)
+    try:
+        conn.send({'type': 'ready'})
+    except (EOFError, OSError):  # The pool closed while this process started
+        return
+
+    while True:
+        try:
+            mode, challenge_id, solution_code, cpu_seconds, fail_fast, reference = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if reference is not None:
+            manager.install_reference(challenge_id, *reference)
+        _apply_cpu_limit(cpu_seconds)
+        if mode == 'analyze':
+            events = manager.iter_analysis(challenge_id, solution_code)
+        else:
+            events = manager.iter_solution(challenge_id, solution_code, fail_fast)
+        for event in events:
+            try:
+                conn.send(event)
+            except Exception as e:
+                # Results holding objects defined by the solution cannot be pickled
+                conn.send({'type': 'error', 'error': f"Could not return test results: {e}"})
+                break
+
+class _SandboxWorker:
+    """Handle on one pre-started sandbox process."""
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+        # Challenge -> version of the reference data already sent
+        self.references: Dict[str, Any] = {}
+
+    def kill(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+
+class SandboxPool:
+    """Pool of pre-warmed processes that run submitted solutions under resource limits."""
+    # A worker still starting after this long is logged (it keeps being waited for)
+    WARMUP_WARNING = 60.0
+    # Pause before replacing a worker that died while starting
+    RESPAWN_DELAY = 1.0
+
+    def __init__(self, problems_dir: Path, size: int = 2, timeout: float = 10.0,
+                 cpu_seconds: Optional[int] = 10, memory_limit: Optional[int] = 512 * 1024 * 1024,
+                 max_jobs_per_worker: int = 50, bundle_path: Optional[Path] = None):
+        self.problems_dir = problems_dir
+        self.bundle_path = bundle_path
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_limit = memory_limit
+        # Submissions run arbitrary code, so workers are recycled to shed leaked state
+        self.max_jobs_per_worker = max_jobs_per_worker
+
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            self._context.set_forkserver_preload(['yaml', 'app.utils.challenge_manager'])
+
+        self._idle: 'queue.Queue[_SandboxWorker]' = queue.Queue()
+        self._workers: List[_SandboxWorker] = []
+        self._workers_lock = threading.Lock()
+        self._busy = 0
+        self._closed = False
+
+        # Started in the background and together; jobs wait in stream() for the first to be ready
+        for _ in range(size):
+            threading.Thread(target=self._start_worker, daemon=True).start()
+        logging.info(f"Starting {size} sandbox workers ({method})")
+
+    def _spawn(self) -> _SandboxWorker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, str(self.problems_dir), self.bundle_path and str(self.bundle_path), self.memory_limit),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        worker = _SandboxWorker(process, parent_conn)
+        with self._workers_lock:
+            self._workers.append(worker)
+        return worker
+
+    def _start_worker(self):
+        """Spawn a worker and make it idle once it reports ready, retrying while the pool is open.
+
+        A worker only takes jobs after its ready message is read, so the
+        message is never mistaken for a job's events.
+        """
+        while not self._closed:
+            worker = self._spawn()
+            if self._await_ready(worker):
+                self._idle.put(worker)
+                return
+            self._discard(worker)
+            time.sleep(self.RESPAWN_DELAY)
+
+    def _await_ready(self, worker: _SandboxWorker) -> bool:
+        """Wait for a new worker's ready message; False if it died or the pool closed first."""
+        started = time.monotonic()
+        try:
+            while not worker.conn.poll(self.WARMUP_WARNING):
+                if self._closed:
+                    return False
+                logging.warning(f"Sandbox worker still warming up after {time.monotonic() - started:.0f}s")
+            return worker.conn.recv().get('type') == 'ready'
+        except (EOFError, OSError):
+            if not self._closed:
+                logging.error("Sandbox worker died while warming up")
+            return False
+
+    def _discard(self, worker: _SandboxWorker):
+        with self._workers_lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.kill()
+
+    def _retire(self, worker: _SandboxWorker):
+        """Kill a worker and start its replacement in the background."""
+        self._discard(worker)
+        threading.Thread(target=self._start_worker, daemon=True).start()
+
+    def _release(self, worker: _SandboxWorker):
+        if worker.jobs >= self.max_jobs_per_worker or not worker.process.is_alive():
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+    def stream(self, challenge_id: str, solution_code: str, fail_fast: bool = False,
+               mode: str = 'grade', reference: Optional[Tuple] = None) -> Iterator[Dict[str, Any]]:
+        """Grade a solution in a sandbox process, yielding result events as they arrive.
+
+        With mode='analyze' the process runs a complexity analysis instead
+        (ChallengeManager.iter_analysis). reference is the challenge's
+        (version, generated, reference_times, reference_profile),
+        sent to each worker once.
+
+        The timeout covers the whole run. Closing the generator early kills
+        the worker, since it may still be executing the solution.
+        """
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            yield {'type': 'error', 'error': 'All sandbox workers are busy, please try again'}
+            return
+
+        worker.jobs += 1
+        with self._workers_lock:
+            self._busy += 1
+        finished = False
+        deadline = time.monotonic() + self.timeout
+        try:
+            if reference is not None and worker.references.get(challenge_id) == reference[0]:
+                reference = None
+            worker.conn.send((mode, challenge_id, solution_code, self.cpu_seconds, fail_fast, reference))
+            if reference is not None:
+                worker.references[challenge_id] = reference[0]
+            while True:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    logging.warning(f"Solution for {challenge_id} exceeded {self.timeout:g}s, killing sandbox worker")
+                    yield {'type': 'error', 'error': f"Time limit exceeded ({self.timeout:g}s)"}
+                    return
+                event = worker.conn.recv()
+                if event['type'] != 'result':
+                    finished = True
+                    yield event
+                    return
+                yield event
+        except (EOFError, OSError):
+            logging.warning(f"Sandbox worker died while running a solution for {challenge_id}")
+            yield {'type': 'error', 'error': 'Solution process was terminated (CPU or memory limit exceeded)'}
+        finally:
+            with self._workers_lock:
+                self._busy -= 1
+            if finished:
+                self._release(worker)
+            else:
+                self._retire(worker)
+
+    def run(self, challenge_id: str, solution_code: str, fail_fast: bool = False) -> Dict[str, Any]:
+        """Grade a solution in a sandbox process and return the test_solution result dict."""
+        from app.utils.challenge_manager import collect_results
+        return collect_results(self.stream(challenge_id, solution_code, fail_fast))
+
+    def close(self, wait: float = 0.0):
+        """Terminate every sandbox process, first giving running solutions up to wait seconds to finish."""
+        self._closed = True
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            with self._workers_lock:
+                if not self._busy:
+                    break
+            time.sleep(0.05)
+        with self._workers_lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
@@ -0,0 +1,151 @@
+# app/utils/shared_alarms.py
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; every process acts as leader there
+    fcntl = None
+
+from app.models.alarm import DEFAULT_OWNER
+
+class LeaderLock:
+    """Non-blocking exclusive file lock electing the one process that runs the AlarmWorker.
+
+    The lock is tied to the open file, so it is released when the holder exits or dies.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.held = False
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        if self.held:
+            return True
+        if fcntl is None:
+            self.held = True
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Record the holder for anyone inspecting the lock file
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        self._file = lock_file
+        self.held = True
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.held = False
+
+def active_alarm(store, owner: str) -> Optional[Dict]:
+    """A user's earliest-triggered active alarm from the shared store, as AlarmWorker reports it."""
+    oldest = store.oldest_active(owner)
+    if oldest is None:
+        return None
+    alarm_id, info = oldest
+    return {'alarm_id': alarm_id, **info}
+
+class StoreNotifier:
+    """AlarmNotifier stand-in for processes that only see the shared store: polls it."""
+
+    def __init__(self, store, poll_interval: float = 0.5):
+        self.store = store
+        self.poll_interval = poll_interval
+
+    def wait(self, owner: str, since_version: Optional[str],
+             timeout: Optional[float] = None) -> Tuple[str, Optional[Dict]]:
+        """Same contract as AlarmNotifier.wait; the version is the serialized state."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = active_alarm(self.store, owner)
+            version = json.dumps(state, sort_keys=True)
+            if version != since_version:
+                return version, state
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return version, state
+            time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+
+class AlarmWorkerProxy:
+    """What routes use as app.alarm_worker in processes that are not the alarm leader.
+
+    Reads and clears active alarms in the shared store; the leader's
+    AlarmWorker picks the changes up on its next sync.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.notifier = StoreNotifier(store)
+
+    def get_active_alarm(self, owner: str = DEFAULT_OWNER) -> Optional[Dict]:
+        return active_alarm(self.store, owner)
+
+    def clear_alarm(self, alarm_id: str):
+        self.store.deactivate(alarm_id)
+
+    def dismiss_sound(self):
+        self.store.push_command('dismiss_sound')
+
+class AlarmLeadership:
+    """Runs the AlarmWorker in whichever server process holds the leader lock.
+
+    Other processes serve through an AlarmWorkerProxy and keep retrying the
+    lock, so a follower takes over if the leader exits.
+    """
+
+    RETRY_INTERVAL = 5.0
+
+    def __init__(self, app, alarm_manager, lock_path: Path):
+        self.app = app
+        self.alarm_manager = alarm_manager
+        self.lock = LeaderLock(lock_path)
+        self.worker = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.app.alarm_worker = AlarmWorkerProxy(self.alarm_manager.store)
+        if not self._try_lead():
+            self._thread = threading.Thread(target=self._retry_loop, daemon=True)
+            self._thread.start()
+
+    def _try_lead(self) -> bool:
+        if not self.lock.try_acquire():
+            return False
+        from app.utils.alarm_worker import AlarmWorker
+        self.worker = AlarmWorker(self.alarm_manager, self.app.challenge_manager, shared=True)
+        self.worker.start()
+        self.app.alarm_worker = self.worker
+        logging.info("This process is the alarm leader")
+        return True
+
+    def _retry_loop(self):
+        while not self._stopped.wait(self.RETRY_INTERVAL):
+            if self._try_lead():
+                return
+
+    def stop(self):
+        self._stopped.set()
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        self.lock.release()
@@ -0,0 +1,44 @@
+# app/utils/sound_cache.py
+
+import hashlib
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+class SoundCache:
+    """On-disk cache of decoded (raw PCM) sounds, read back through mmap.
+
+    Entries are keyed by the source file's stat and the mixer parameters,
+    since the decoded samples depend on both.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, source: Path, mixer_params: Tuple) -> Path:
+        st = source.stat()
+        key = f"{source.resolve()}|{st.st_mtime_ns}|{st.st_size}|{mixer_params}"
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f"{source.stem}-{digest}.pcm"
+
+    def get(self, source: Path, mixer_params: Tuple) -> Optional[mmap.mmap]:
+        """Map the cached samples for a sound file, or return None on a miss."""
+        try:
+            with open(self._entry_path(source, mixer_params), 'rb') as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: empty file
+            return None
+
+    def put(self, source: Path, mixer_params: Tuple, samples: bytes):
+        """Store decoded samples atomically, so readers never map a partial file."""
+        path = self._entry_path(source, mixer_params)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(samples)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write sound cache entry {path.name}: {e}")
@@ -0,0 +1,115 @@
+# benchmarks/import_budget.py
+"""Import-time budget for application entry points.
+
+Usage (from the repository root):
+    python -m benchmarks.import_budget            # check every target against its budget
+    python -m benchmarks.import_budget --runs 9   # more samples per target
+    python -m benchmarks.import_budget --verbose  # also list the slowest modules
+
+Each target runs in a fresh interpreter under `python -X importtime`.
+Its import time is the sum of every module's own time, taking the median
+over several runs. A target fails when it goes over its budget or when
+it imports one of its forbidden (heavy, optional) modules. On any
+failure the exit status is 1.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Modules only the code paths that use them may import
+AUDIO_AND_INPUT = ('pygame', 'pynput')
+CHALLENGE_SOURCES = ('markdown', 'yaml')
+
+# name -> (statement, budget in milliseconds, forbidden top-level modules)
+# Flask alone accounts for most of the create_app and app.routes budgets
+TARGETS = {
+    'create_app': (
+        "from app import create_app; create_app()",
+        300, AUDIO_AND_INPUT + CHALLENGE_SOURCES
+    ),
+    'app.routes': (
+        "import app.routes",
+        250, AUDIO_AND_INPUT + CHALLENGE_SOURCES
+    ),
+    'app.utils.challenge_manager': (
+        "import app.utils.challenge_manager",
+        100, AUDIO_AND_INPUT + CHALLENGE_SOURCES
+    ),
+    'app.utils.alarm_worker': (
+        "import app.utils.alarm_worker",
+        100, AUDIO_AND_INPUT
+    ),
+    'app.models': (
+        "import app.models",
+        75, AUDIO_AND_INPUT + CHALLENGE_SOURCES
+    )
+}
+
+# Keep targets hermetic: no sandbox processes, no alarm database on disk
+TARGET_ENV = {'SANDBOX_ENABLED': '0', 'ALARM_DB_PATH': ':memory:'}
+
+def measure_imports(statement):
+    """Run statement under -X importtime; returns {module: self time in microseconds}."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, env={**os.environ, **TARGET_ENV},
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{completed.stderr[-2000:]}")
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|', 2)
+        modules[name.strip()] = int(self_us)
+    return modules
+
+def check_target(statement, forbidden, runs):
+    """Return (median ms, offending modules, module timings of the last run)."""
+    totals = []
+    for _ in range(runs):
+        modules = measure_imports(statement)
+        totals.append(sum(modules.values()) / 1000)
+    offending = sorted({
+        module for module in modules
+        if module.split('.')[0] in forbidden
+    })
+    return statistics.median(totals), offending, modules
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help="interpreter runs per target (default 5)")
+    parser.add_argument('-k', '--filter', help="only check targets whose name contains this text")
+    parser.add_argument('--verbose', action='store_true', help="show the slowest modules of each target")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for name, (statement, budget_ms, forbidden) in TARGETS.items():
+        if args.filter and args.filter not in name:
+            continue
+        median_ms, offending, modules = check_target(statement, forbidden, args.runs)
+        status = 'ok' if median_ms <= budget_ms and not offending else 'FAIL'
+        print(f"{name:40s} {median_ms:8.1f} ms  (budget {budget_ms} ms)  {status}")
+        if offending:
+            print(f"    imports forbidden modules: {', '.join(offending[:10])}")
+        if args.verbose:
+            for module, self_us in sorted(modules.items(), key=lambda item: -item[1])[:10]:
+                print(f"    {self_us / 1000:8.1f} ms  {module}")
+        failures += status == 'FAIL'
+
+    if failures:
+        print(f"{failures} target(s) over budget")
+        return 1
+    print("All targets within budget")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,375 @@
+# benchmarks/run.py
+"""Micro-benchmarks for the alarm and challenge hot paths.
+
+Usage (from the repository root):
+    python -m benchmarks.run                    # run everything, compare with the baseline
+    python -m benchmarks.run --quick -k alarm   # small sizes, only benchmarks matching "alarm"
+    python -m benchmarks.run --save-baseline    # record the current numbers as the baseline
+
+Results are written as JSON (see --output). When a baseline exists, any
+benchmark whose median is more than --threshold times slower is reported
+as a regression and the exit status is 1.
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from config import Config
+
+BENCH_DIR = Path(__file__).parent
+PROBLEMS_DIR = Config.PROBLEMS_DIR
+DEFAULT_OUTPUT = BENCH_DIR / 'results.json'
+DEFAULT_BASELINE = BENCH_DIR / 'baseline.json'
+
+ALARM_SIZES = (10, 1000, 10000, 100000)
+BANK_SIZES = (10, 100, 1000, 10000)
+QUICK_ALARM_SIZES = (10, 1000)
+QUICK_BANK_SIZES = (10, 100)
+SELECTOR_SIZES = (2, 1000, 50000)
+QUICK_SELECTOR_SIZES = (2, 1000)
+
+BENCHMARKS = []
+
+def benchmark(name, sizes=(None,), quick_sizes=None):
+    """Register a benchmark factory.
+
+    The factory receives a size and returns (callable, cleanup); only the
+    callable is timed.
+    """
+    def register(factory):
+        BENCHMARKS.append((name, factory, sizes, quick_sizes or sizes))
+        return factory
+    return register
+
+def measure(func, min_time=0.2, max_time=5.0, min_runs=3, max_runs=1000):
+    """Time func repeatedly; returns per-call timings in seconds.
+
+    Runs for at least min_time and min_runs calls, but stops adding calls
+    past min_time once max_time is spent (so very slow benchmarks run once).
+    """
+    timings = []
+    started = time.perf_counter()
+    while not timings or len(timings) < max_runs:
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time and (len(timings) >= min_runs or elapsed >= max_time):
+            break
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+# --- Fixtures ---------------------------------------------------------------
+
+def add_alarms(manager, size):
+    for i in range(size):
+        manager.add_alarm(f"{i % 24:02d}:{i % 60:02d}", owner=f"user{i % 1000}")
+    return manager
+
+def fresh_alarm_manager(size=0):
+    """A new in-memory AlarmManager holding `size` alarms."""
+    from app.models.alarm import AlarmManager
+    return add_alarms(AlarmManager(':memory:'), size)
+
+class SilentSound:
+    """Stand-in for AlarmSound so benchmarks never touch the audio stack."""
+    def __init__(self, *args, **kwargs):
+        self.playing = False
+
+    def play(self, *args, **kwargs):
+        self.playing = True
+
+    def stop(self):
+        self.playing = False
+
+    def release(self):
+        self.playing = False
+
+@contextmanager
+def silent_worker_dependencies():
+    """Stub out audio and global input listeners for AlarmWorker."""
+    from app.utils import alarm_worker
+    with mock.patch.object(alarm_worker, 'AlarmSound', SilentSound), \
+            mock.patch.object(alarm_worker.ActivityMonitor, 'start_monitoring'), \
+            mock.patch.object(alarm_worker.ActivityMonitor, 'stop_monitoring'):
+        yield alarm_worker
+
+def make_problem_bank(size):
+    """Create a temporary bank of `size` copies of the sorting problem."""
+    root = Path(tempfile.mkdtemp(prefix='bench-bank-'))
+    source = PROBLEMS_DIR / 'sorting'
+    for i in range(size):
+        shutil.copytree(source, root / 'problems' / f"sorting_{i:05d}")
+    return root
+
+# --- Benchmarks ---------------------------------------------------------------
+
+@benchmark('alarm_manager.add_alarm', ALARM_SIZES, QUICK_ALARM_SIZES)
+def bench_add_alarm(size):
+    manager = fresh_alarm_manager(size)
+    return lambda: manager.add_alarm('07:30'), manager.store.close
+
+@benchmark('alarm_manager.get_alarms', ALARM_SIZES, QUICK_ALARM_SIZES)
+def bench_get_alarms(size):
+    manager = fresh_alarm_manager(size)
+    return manager.get_alarms, manager.store.close
+
+@benchmark('alarm_worker.tick', ALARM_SIZES, QUICK_ALARM_SIZES)
+def bench_worker_tick(size):
+    manager = fresh_alarm_manager(size)
+    with silent_worker_dependencies() as alarm_worker:
+        worker = alarm_worker.AlarmWorker(manager, mock.Mock())
+    return lambda: worker.tick(0), manager.store.close
+
+@benchmark('challenge_manager.load_all_challenges.cold', BANK_SIZES, QUICK_BANK_SIZES)
+def bench_load_cold(size):
+    from app.utils.challenge_manager import ChallengeManager
+    root = make_problem_bank(size)
+
+    def load():
+        shutil.rmtree(root / 'cache', ignore_errors=True)
+        ChallengeManager(root / 'problems', root / 'cache').load_all_challenges()
+    return load, lambda: shutil.rmtree(root)
+
+@benchmark('challenge_manager.load_all_challenges.warm', BANK_SIZES, QUICK_BANK_SIZES)
+def bench_load_warm(size):
+    from app.utils.challenge_manager import ChallengeManager
+    root = make_problem_bank(size)
+    ChallengeManager(root / 'problems', root / 'cache').load_all_challenges()
+
+    def load():
+        ChallengeManager(root / 'problems', root / 'cache').load_all_challenges()
+    return load, lambda: shutil.rmtree(root)
+
+@benchmark('challenge_manager.get_challenge.first_use', BANK_SIZES, QUICK_BANK_SIZES)
+def bench_registry_lookup(size):
+    from app.utils.challenge_manager import ChallengeManager
+    root = make_problem_bank(size)
+
+    def lookup():
+        ChallengeManager(root / 'problems', root / 'cache').get_challenge('sorting_00000')
+    return lookup, lambda: shutil.rmtree(root)
+
+@benchmark('challenge_manager.get_challenge.first_use.bundle', BANK_SIZES, QUICK_BANK_SIZES)
+def bench_bundle_lookup(size):
+    from app.utils.challenge_manager import ChallengeManager
+    from app.utils.problem_bundle import build_bundle
+    root = make_problem_bank(size)
+    build_bundle(root / 'problems', root / 'problems.bundle')
+
+    def lookup():
+        manager = ChallengeManager(root / 'problems', root / 'cache', bundle_path=root / 'problems.bundle')
+        manager.get_challenge('sorting_00000')
+        manager.bundle.close()
+    return lookup, lambda: shutil.rmtree(root)
+
+@benchmark('challenge_selector.choose.spaced', SELECTOR_SIZES, QUICK_SELECTOR_SIZES)
+def bench_selector_choose(size):
+    from app.models.alarm_store import AlarmStore
+    from app.utils.challenge_selector import SpacedRepetitionSelector
+    store = AlarmStore(':memory:')
+    selector = SpacedRepetitionSelector(store, [f"problem_{i:06d}" for i in range(size)])
+    for i in range(0, size, max(1, size // 100)):
+        selector.record('bench', f"problem_{i:06d}", i % 3 != 0, 60.0)
+    selector.choose('bench')  # Builds the user's weight tree
+    return lambda: selector.choose('bench'), store.close
+
+def _reference_solution_bench(challenge_id):
+    from app.utils.challenge_manager import ChallengeManager
+    manager = ChallengeManager(PROBLEMS_DIR)
+    solution = (PROBLEMS_DIR / challenge_id / 'solution.py').read_text(encoding='utf-8')
+
+    def run():
+        result = manager.run_solution(challenge_id, solution)
+        assert result.get('all_passed'), result
+    return run, None
+
+@benchmark('challenge_manager.run_solution.sorting')
+def bench_solution_sorting(size):
+    return _reference_solution_bench('sorting')
+
+@benchmark('challenge_manager.run_solution.bfs_ss')
+def bench_solution_bfs(size):
+    return _reference_solution_bench('bfs_ss')
+
+@benchmark('challenge_manager.test_solution.cached')
+def bench_solution_cached(size):
+    from app.utils.challenge_manager import ChallengeManager
+    manager = ChallengeManager(PROBLEMS_DIR)
+    solution = (PROBLEMS_DIR / 'sorting' / 'solution.py').read_text(encoding='utf-8')
+    manager.test_solution('sorting', solution)  # Populate the result cache
+
+    def run():
+        result = manager.test_solution('sorting', solution)
+        assert result.get('all_passed'), result
+    return run, None
+
+@benchmark('challenge_manager.test_solution.sandbox')
+def bench_solution_sandbox(size):
+    from app.utils.challenge_manager import ChallengeManager
+    # Measure grading itself, not result cache hits
+    manager = ChallengeManager(PROBLEMS_DIR, result_cache_size=0)
+    manager.start_sandbox(size=1)
+    solution = (PROBLEMS_DIR / 'sorting' / 'solution.py').read_text(encoding='utf-8')
+    manager.test_solution('sorting', solution)  # Wait for the worker to come up
+
+    def run():
+        result = manager.test_solution('sorting', solution)
+        assert result.get('all_passed'), result
+    return run, manager.stop_sandbox
+
+def _api_client(size=0):
+    from app import create_app
+
+    class BenchConfig(Config):
+        ALARM_DB_PATH = ':memory:'
+        SANDBOX_ENABLED = False
+        RESULT_CACHE_SIZE = 0
+
+    app = create_app(BenchConfig)
+    manager = add_alarms(app.alarm_manager, size)
+    with silent_worker_dependencies() as alarm_worker:
+        app.alarm_worker = alarm_worker.AlarmWorker(manager, app.challenge_manager)
+    return app.test_client(), manager
+
+@benchmark('api.GET /api/alarms', ALARM_SIZES, QUICK_ALARM_SIZES)
+def bench_api_alarms(size):
+    client, manager = _api_client(size)
+    return lambda: client.get('/api/alarms'), manager.store.close
+
+@benchmark('api.GET /api/alarms?limit=100 (last page)', ALARM_SIZES, QUICK_ALARM_SIZES)
+def bench_api_alarms_page(size):
+    client, manager = _api_client(size)
+    # The deepest page, which an offset-based listing would make the slowest
+    ids = sorted(manager.alarms)
+    cursor = ids[-101] if len(ids) > 100 else ''
+    return lambda: client.get(f'/api/alarms?limit=100&cursor={cursor}'), manager.store.close
+
+@benchmark('alarm_manager.add_alarms (1000 alarms)', ALARM_SIZES, QUICK_ALARM_SIZES)
+def bench_add_alarms(size):
+    manager = fresh_alarm_manager(size)
+    specs = [{'time': f"{i % 24:02d}:{i % 60:02d}"} for i in range(1000)]
+    return lambda: manager.add_alarms(specs), manager.store.close
+
+@benchmark('api.GET /api/challenges')
+def bench_api_challenges(size):
+    client, manager = _api_client()
+    return lambda: client.get('/api/challenges'), manager.store.close
+
+@benchmark('api.GET /api/check-alarms')
+def bench_api_check_alarms(size):
+    client, manager = _api_client()
+    return lambda: client.get('/api/check-alarms'), manager.store.close
+
+@benchmark('api.POST /api/verify-solution')
+def bench_api_verify(size):
+    client, manager = _api_client()
+    payload = {
+        'challenge_id': 'sorting',
+        'solution': (PROBLEMS_DIR / 'sorting' / 'solution.py').read_text(encoding='utf-8')
+    }
+    return lambda: client.post('/api/verify-solution', json=payload), manager.store.close
+
+@benchmark('metrics.histogram.observe x1000')
+def bench_histogram_observe(size):
+    from app.utils.metrics import Histogram
+    histogram = Histogram('bench_seconds', "Benchmark histogram", ('label',))
+
+    def observe():
+        for i in range(1000):
+            histogram.observe(i * 1e-5, 'bench')
+    return observe, None
+
+@benchmark('api.GET /metrics')
+def bench_api_metrics(size):
+    client, manager = _api_client()
+    return lambda: client.get('/metrics'), manager.store.close
+
+# --- Runner -----------------------------------------------------------------
+
+def run_benchmarks(pattern=None, quick=False):
+    results = {}
+    for name, factory, sizes, quick_sizes in BENCHMARKS:
+        for size in (quick_sizes if quick else sizes):
+            key = name if size is None else f"{name}[{size}]"
+            if pattern and pattern not in key:
+                continue
+
+            func, cleanup = factory(size)
+            try:
+                timings = measure(func)
+            finally:
+                if cleanup:
+                    cleanup()
+
+            results[key] = {
+                'median': statistics.median(timings),
+                'min': min(timings),
+                'runs': len(timings)
+            }
+            print(f"{key:60s} {results[key]['median'] * 1e6:12.1f} us  ({len(timings)} runs)")
+    return results
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline median, current median, ratio) for every regression."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous or not previous['median']:
+            continue
+        ratio = current['median'] / previous['median']
+        if ratio > threshold:
+            regressions.append((key, previous['median'], current['median'], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', '--filter', help="only run benchmarks whose name contains this text")
+    parser.add_argument('--quick', action='store_true', help="use small sizes only")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio that counts as a regression (default 1.25)")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': args.quick
+        },
+        'results': run_benchmarks(args.filter, args.quick)
+    }
+    args.output.write_text(json.dumps(report, indent=2, sort_keys=True))
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("No baseline to compare against (run with --save-baseline)")
+        return 0
+
+    regressions = compare(report['results'], json.loads(args.baseline.read_text()), args.threshold)
+    for key, before, after, ratio in regressions:
+        print(f"REGRESSION {key}: {before * 1e6:.1f} us -> {after * 1e6:.1f} us ({ratio:.2f}x)")
+    if regressions:
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
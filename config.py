@@ -11,10 +11,27 @@ class Config:
     BASE_DIR = Path(__file__).parent
     PROBLEMS_DIR = BASE_DIR / 'app' / 'problems'
     STATIC_DIR = BASE_DIR / 'app' / 'static'
+    INSTANCE_DIR = BASE_DIR / 'instance'
     
-    # Ensure required directories exist
-    PROBLEMS_DIR.mkdir(exist_ok=True)
-    (STATIC_DIR / 'sounds').mkdir(exist_ok=True, parents=True)
+    # Alarm persistence (SQLite); ':memory:' keeps alarms in-process only
+    ALARM_DB_PATH = os.environ.get('ALARM_DB_PATH') or str(INSTANCE_DIR / 'alarms.db')
+    
+    # Alarm sounds as name=file pairs (files in static/sounds), e.g. "alarm=alarm.mp3,chime=chime.wav"
+    ALARM_SOUNDS = dict(
+        entry.strip().split('=', 1)
+        for entry in os.environ.get('ALARM_SOUNDS', 'alarm=alarm.mp3').split(',')
+        if '=' in entry
+    )
+    ALARM_SOUND = os.environ.get('ALARM_SOUND') or next(iter(ALARM_SOUNDS), 'alarm')  # Sound played on trigger
+    SOUND_CACHE_DIR = BASE_DIR / '.cache' / 'sounds'  # Decoded PCM, keyed by file and mixer settings
+    
+    # Production serving (serve.py): worker processes share alarms through ALARM_DB_PATH,
+    # and whichever holds LEADER_LOCK_PATH runs the AlarmWorker
+    SHARED_STATE = os.environ.get('SHARED_STATE', '0') == '1'
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', os.cpu_count() or 1))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))  # Per worker (gunicorn only)
+    LEADER_LOCK_PATH = INSTANCE_DIR / 'alarm_worker.lock'
     
     # Security settings
     SESSION_COOKIE_HTTPONLY = True
@@ -24,4 +41,30 @@ class Config:
     # Custom settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'py', 'md', 'yaml', 'mp3'}
+    
+    # Solution sandbox: submissions run in pre-started worker processes
+    SANDBOX_ENABLED = os.environ.get('SANDBOX_ENABLED', '1') == '1'
+    SANDBOX_WORKERS = int(os.environ.get('SANDBOX_WORKERS', 2))
+    SANDBOX_TIMEOUT = float(os.environ.get('SANDBOX_TIMEOUT', 10))  # Wall-clock seconds per submission
+    SANDBOX_CPU_SECONDS = int(os.environ.get('SANDBOX_CPU_SECONDS', 10))
+    SANDBOX_MEMORY_MB = int(os.environ.get('SANDBOX_MEMORY_MB', 512))
+    
+    # Grading job queue for /api/verify-solution; submissions beyond the queue size get a 429
+    GRADING_WORKERS = int(os.environ.get('GRADING_WORKERS', 2))
+    GRADING_QUEUE_SIZE = int(os.environ.get('GRADING_QUEUE_SIZE', 32))
+    GRADING_JOB_TTL = float(os.environ.get('GRADING_JOB_TTL', 300))  # Seconds a finished job stays pollable
+    
+    # Packed problem bank read instead of PROBLEMS_DIR when set; build it with
+    # `python -m app.utils.problem_bundle`
+    PROBLEM_BUNDLE = Path(os.environ['PROBLEM_BUNDLE']) if os.environ.get('PROBLEM_BUNDLE') else None
+    
+    # Largest NDJSON body /api/alarms/import accepts; it is read a line at a time, not buffered
+    ALARM_IMPORT_MAX_BYTES = int(os.environ.get('ALARM_IMPORT_MAX_BYTES', 1024 * 1024 * 1024))
+    
+    # How alarms pick a challenge: 'spaced' favors the ones a user fails or solves slowly, 'uniform' picks evenly
+    CHALLENGE_SELECTOR = os.environ.get('CHALLENGE_SELECTOR', 'spaced')
+    
+    # Graded submissions kept for instant resubmission (0 disables)
+    RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 256))
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 3600))  # Seconds
 
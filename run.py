@@ -2,8 +2,6 @@
 import logging
 from app import create_app
 from app.utils.alarm_worker import AlarmWorker
-from app.models.alarm import AlarmManager
-from app.utils.challenge_manager import ChallengeManager
 
 def setup_logging():
     """Configure logging for the application."""
@@ -26,12 +24,8 @@ def main():
         # Create Flask app
         app = create_app()
         
-        # Initialize managers
-        alarm_manager = AlarmManager()
-        challenge_manager = ChallengeManager()
-        
-        # Create and start alarm worker
-        alarm_worker = AlarmWorker(alarm_manager, challenge_manager)
+        # Create and start alarm worker (the alarm and challenge managers are shared with the app)
+        alarm_worker = AlarmWorker(app.alarm_manager, app.challenge_manager)
         alarm_worker.start()
         
         # Store worker in app context
@@ -48,6 +42,9 @@ def main():
         logging.info("Application shutdown")
         if 'alarm_worker' in locals():
             alarm_worker.stop()
+        if 'app' in locals():
+            app.grading_queue.stop()
+            app.challenge_manager.stop_sandbox()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,127 @@
+# serve.py
+"""Production entry point: several worker processes behind one port.
+
+Alarms and active challenges live in the SQLite store (ALARM_DB_PATH),
+shared by every worker. Exactly one worker, elected through a file lock,
+runs the AlarmWorker. The others serve through a proxy and take over if
+the leader exits.
+
+Uses gunicorn (gthread workers) when it is installed. Otherwise it falls
+back to pre-forked Werkzeug servers sharing one listening socket.
+Settings: SERVER_BIND, SERVER_WORKERS, SERVER_THREADS (see config.py).
+"""
+import logging
+import os
+import signal
+import socket
+import sys
+from config import Config
+from run import setup_logging
+
+class ServeConfig(Config):
+    SHARED_STATE = True
+
+def build_app():
+    """Create the app in a worker process and join the alarm leader election."""
+    from app import create_app
+    from app.utils.shared_alarms import AlarmLeadership
+
+    app = create_app(ServeConfig)
+    app.alarm_leadership = AlarmLeadership(app, app.alarm_manager, app.config['LEADER_LOCK_PATH'])
+    app.alarm_leadership.start()
+    return app
+
+def shutdown_app(app):
+    app.alarm_leadership.stop()
+    app.grading_queue.stop()
+    app.challenge_manager.stop_sandbox()
+
+def serve_gunicorn(bind: str, workers: int, threads: int):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            # Never preload: every worker needs its own SQLite connection and threads
+            for key, value in {
+                'bind': bind,
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'preload_app': False,
+                'worker_exit': lambda server, worker: shutdown_app(worker.wsgi)
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return build_app()
+
+    Server().run()
+
+def serve_prefork(bind: str, workers: int):
+    """Fork `workers` threaded Werkzeug servers that accept on one shared socket."""
+    from werkzeug.serving import make_server
+
+    host, port = bind.rsplit(':', 1)
+    listener = socket.create_server((host, int(port)), backlog=128)
+    listener.set_inheritable(True)
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid:
+            children.add(pid)
+            return
+        # Child: build the app only now, so nothing stateful crosses the fork
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        app = build_app()
+        server = make_server(host, int(port), app, threaded=True, fd=listener.fileno())
+        try:
+            server.serve_forever()
+        finally:
+            shutdown_app(app)
+            os._exit(0)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    logging.info(f"Serving on {bind} with {workers} worker processes")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            logging.warning(f"Worker {pid} exited with status {status}, restarting it")
+            spawn()
+
+def main():
+    setup_logging()
+    if ServeConfig.ALARM_DB_PATH == ':memory:':
+        sys.exit("serve.py needs a file-backed ALARM_DB_PATH shared by all workers")
+
+    bind, workers = ServeConfig.SERVER_BIND, ServeConfig.SERVER_WORKERS
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        if not hasattr(os, 'fork'):
+            sys.exit("serve.py needs gunicorn or a platform with os.fork")
+        logging.info("gunicorn not installed, using pre-forked Werkzeug servers")
+        serve_prefork(bind, workers)
+    else:
+        serve_gunicorn(bind, workers, ServeConfig.SERVER_THREADS)
+
+if __name__ == '__main__':
+    main()